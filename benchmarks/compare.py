@@ -0,0 +1,43 @@
+"""
+Compare two result files of `benchmarks.run`, printing the ratio of every timing.
+
+    python -m benchmarks.compare baseline.json results.json
+"""
+
+import argparse, json
+
+
+def timings(results: dict, prefix: str = "") -> dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict) and "seconds" in value:
+            flat[prefix + key] = value["seconds"]
+        elif isinstance(value, dict):
+            flat |= timings(value, prefix + key + "/")
+    return flat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    args = parser.parse_args()
+
+    with open(args.baseline) as file:
+        baseline = timings(json.load(file)["benchmarks"])
+    with open(args.candidate) as file:
+        candidate = timings(json.load(file)["benchmarks"])
+
+    print(f"{'benchmark':<64}{'baseline s':>12}{'candidate s':>12}{'ratio':>8}")
+    for name in sorted(baseline.keys() | candidate.keys()):
+        old, new = baseline.get(name), candidate.get(name)
+        ratio = f"{new / old:>8.2f}" if old and new is not None else f"{'-':>8}"
+        print(
+            f"{name:<64}{old if old is not None else float('nan'):>12.4f}{new if new is not None else float('nan'):>12.4f}{ratio}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+CPU-only benchmarks of the logging overhead of torch_logs at scale.
+
+    python -m benchmarks.run --scale default --output results.json
+    python -m benchmarks.compare baseline.json results.json
+
+Each benchmark runs in its own temporary directory, pre-populated with synthetic
+loss files, checkpoints or models as needed, and reports the median of its repeats.
+"""
+
+from torch_logs.imports import *
+
+import argparse, json, platform, statistics, tempfile, time
+
+import torch_logs.logger as logger
+import torch_logs.weights as weights
+from torch_logs.checkpoints import CheckpointIndex, CheckpointWriter
+from torch_logs.metrics import MetricStore
+from torch_logs.predictions import PredictionExporter
+from torch_logs.series import MetricCurves
+from torch_logs.utils import latest_numbered_directory
+from torch_logs.writer import MetricWriter
+
+SCALES = {
+    "small": dict(
+        rows=[100_000],
+        columns=[2, 16],
+        checkpoints=[100],
+        params=[100_000],
+        predictions=256,
+        iterations=200,
+    ),
+    "default": dict(
+        rows=[1_000_000],
+        columns=[2, 16, 64],
+        checkpoints=[1000],
+        params=[1_000_000],
+        predictions=2048,
+        iterations=1000,
+    ),
+    "large": dict(
+        rows=[1_000_000, 10_000_000],
+        columns=[2, 16, 64],
+        checkpoints=[1000, 5000],
+        params=[1_000_000, 25_000_000],
+        predictions=8192,
+        iterations=5000,
+    ),
+}
+
+BENCHMARKS: dict[str, Callable[[dict], dict[str, Any]]] = {}
+
+
+def benchmark(function: Callable[[dict], dict[str, Any]]):
+    BENCHMARKS[function.__name__] = function
+    return function
+
+
+def measure(
+    run: Callable[[], Any], repeats: int = 5, setup: Optional[Callable[[], Any]] = None
+) -> dict[str, Any]:
+    times = []
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return {"seconds": statistics.median(times), "repeats": times}
+
+
+@contextlib.contextmanager
+def scratch_directory() -> Iterator[str]:
+    cwd = os.getcwd()
+    path = tempfile.mkdtemp(prefix="torch_logs_bench_")
+    os.chdir(path)
+    try:
+        yield path
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def populate_losses(path: str, rows: int, columns: int, chunk: int = 1_000_000) -> None:
+    names = [f"loss_{c}" for c in range(columns - 1)] + ["objective"]
+    with MetricStore(path, names, dtype="<f4") as store:
+        generator = np.random.default_rng(0)
+        for start in range(0, rows, chunk):
+            values = generator.random((min(chunk, rows - start), columns))
+            store.append(*values.tolist())
+
+
+def synthetic_losses(columns: int) -> Losses:
+    return {f"loss_{c}": torch.rand(()) for c in range(columns - 1)} | {
+        "objective": torch.rand(())
+    }
+
+
+def synthetic_model(params: int) -> nn.Module:
+    width = max(int((params / 4) ** 0.5), 1)
+    return nn.Sequential(
+        nn.Linear(width, width),
+        nn.ReLU(),
+        nn.Linear(width, width),
+        nn.Linear(width, width),
+        nn.Linear(width, width),
+    )
+
+
+@benchmark
+def log_losses(scale: dict) -> dict[str, Any]:
+    results = {}
+    calls = 1000
+    for columns in scale["columns"]:
+        losses = synthetic_losses(columns)
+        with scratch_directory():
+            results[f"columns={columns},sync"] = measure(
+                lambda: [logger.log_losses(losses) for _ in range(calls)], repeats=3
+            )
+            writer = MetricWriter()
+            results[f"columns={columns},writer_submit"] = measure(
+                lambda: [
+                    logger.log_losses(losses, writer=writer) for _ in range(calls)
+                ],
+                repeats=3,
+            )
+            results[f"columns={columns},writer_flush"] = measure(
+                writer.flush, repeats=1
+            )
+            writer.close()
+    return results | {"calls": calls}
+
+
+@benchmark
+def plot_losses(scale: dict) -> dict[str, Any]:
+    results = {}
+    for rows in scale["rows"]:
+        with scratch_directory():
+            populate_losses("training_losses.metrics", rows, 4)
+
+            curves = MetricCurves("training_losses.metrics")
+            results[f"rows={rows},curves_cold"] = measure(
+                curves.update, repeats=3, setup=curves.reset
+            )
+            with MetricStore("training_losses.metrics") as store:
+                results[f"rows={rows},curves_incremental"] = measure(
+                    curves.update, repeats=5, setup=lambda: store.append([1.0] * 4)
+                )
+
+            try:
+                logger.plot_losses(20)
+            except Exception as e:  # * Rendering needs kaleido
+                results[f"rows={rows},render"] = {"skipped": repr(e)}
+            else:
+                results[f"rows={rows},render"] = measure(
+                    lambda: logger.plot_losses(20), repeats=3
+                )
+    return results
+
+
+@benchmark
+def log_model(scale: dict) -> dict[str, Any]:
+    results = {}
+    for params in scale["params"]:
+        model = synthetic_model(params)
+        with scratch_directory():
+            results[f"params={params},sync"] = measure(
+                lambda: logger.log_model(model), repeats=3
+            )
+
+            checkpoints = CheckpointWriter()
+            results[f"params={params},async_return"] = measure(
+                lambda: logger.log_model(model, checkpoints),
+                repeats=3,
+                setup=checkpoints.wait,
+            )
+            results[f"params={params},async_complete"] = measure(
+                lambda: (logger.log_model(model, checkpoints), checkpoints.wait()),
+                repeats=3,
+            )
+            checkpoints.close()
+    return results
+
+
+@benchmark
+def load_weights(scale: dict) -> dict[str, Any]:
+    results = {}
+    for params in scale["params"]:
+        state_dict = synthetic_model(params).state_dict()
+        with scratch_directory():
+            torch.save(state_dict, "weights.pt")
+            weights.save_weights(state_dict, "weights.tensors")
+
+            results[f"params={params},torch_load"] = measure(
+                lambda: torch.load("weights.pt"), repeats=3
+            )
+            results[f"params={params},mmap"] = measure(
+                lambda: weights.load_weights("weights.tensors"), repeats=3
+            )
+    return results
+
+
+@benchmark
+def log_predictions(scale: dict) -> dict[str, Any]:
+    batch_size = 32
+    batches = [
+        torch.rand(batch_size, 3, 64, 64)
+        for _ in range(scale["predictions"] // batch_size)
+    ]
+
+    def export(workers: int) -> None:
+        exporter = PredictionExporter(save_image, workers) if workers > 0 else None
+        for j, preds in enumerate(batches):
+            logger.log_predictions(j, preds, save_image, exporter=exporter)
+        if exporter is not None:
+            exporter.close()
+
+    results = {}
+    with scratch_directory():
+        for workers in [0, 4]:
+            results[f"items={len(batches) * batch_size},workers={workers}"] = measure(
+                lambda: export(workers), repeats=2
+            )
+    return results
+
+
+@benchmark
+def latest_checkpoint(scale: dict) -> dict[str, Any]:
+    results = {}
+    for count in scale["checkpoints"]:
+        with scratch_directory():
+            for num in range(count):
+                os.makedirs(f"checkpoints/{num:05d}")
+            results[f"checkpoints={count}"] = measure(
+                lambda: latest_numbered_directory("checkpoints"), repeats=5
+            )
+            index = CheckpointIndex("checkpoints")
+            index.latest()  # * Built once from a scan, then served from the cache
+            results[f"checkpoints={count},index"] = measure(index.latest, repeats=5)
+    return results
+
+
+TRAINING_SCRIPT = """
+import json, os, sys, time, torch, torch.nn as nn
+from torch.utils.data import DataLoader, TensorDataset
+from torch_loops import TrainingLoop
+from torch_logs import Training
+
+iterations, logging = int(sys.argv[1]), sys.argv[2] == "1"
+torch.manual_seed(0)
+model = nn.Sequential(nn.Linear(64, 256), nn.ReLU(), nn.Linear(256, 1))
+dataloader = DataLoader(TensorDataset(torch.randn(4096, 64), torch.randn(4096, 1)), batch_size=32, shuffle=True)
+loop = TrainingLoop(model, dataloader=dataloader, criterions={"mse": (1.0, nn.MSELoss())}, optimizers=[torch.optim.SGD(model.parameters(), lr=1e-3)], amp=False)
+
+start = time.perf_counter()
+if logging:
+    for _ in Training("runs/bench", None, iterations, loop, None, async_plots=False):
+        pass
+else:
+    i = 0
+    while i < iterations:
+        for _ in loop:
+            i += 1
+            if i >= iterations:
+                break
+print(json.dumps({"seconds": time.perf_counter() - start}))
+"""
+
+
+@benchmark
+def training_iteration(scale: dict) -> dict[str, Any]:
+    results = {}
+    with scratch_directory():
+        with open("bench_training.py", "w") as file:
+            file.write(TRAINING_SCRIPT)
+
+        for logging_enabled in ["0", "1"]:
+            # * In a fresh interpreter, since Training captures stdout and stderr
+            process = subprocess.run(
+                [
+                    sys.executable,
+                    "bench_training.py",
+                    str(scale["iterations"]),
+                    logging_enabled,
+                ],
+                capture_output=True,
+                text=True,
+                env=os.environ | {"PYTHONPATH": os.pathsep.join(sys.path)},
+            )
+            name = "with_logging" if logging_enabled == "1" else "without_logging"
+            if process.returncode != 0:
+                results[name] = {"skipped": process.stderr.strip().splitlines()[-1]}
+            else:
+                # * The captured stderr is teed into stdout as well
+                lines = process.stdout.strip().splitlines()
+                results[name] = json.loads([l for l in lines if l.startswith("{")][-1])
+
+    if "seconds" in results["with_logging"] and "seconds" in results["without_logging"]:
+        results["overhead"] = (
+            results["with_logging"]["seconds"] / results["without_logging"]["seconds"]
+            - 1
+        )
+    return results | {"iterations": scale["iterations"]}
+
+
+def environment() -> dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(__file__),
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "platform": platform.platform(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--scale", choices=SCALES.keys(), default="default")
+    parser.add_argument(
+        "--only", nargs="*", choices=BENCHMARKS.keys(), default=list(BENCHMARKS.keys())
+    )
+    parser.add_argument("--output", default="bench_output.json")
+    args = parser.parse_args()
+
+    torch.set_num_threads(1)
+    results = {"scale": args.scale, "environment": environment(), "benchmarks": {}}
+
+    for name in args.only:
+        print(f"Running {name}...", flush=True)
+        results["benchmarks"][name] = BENCHMARKS[name](SCALES[args.scale])
+
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
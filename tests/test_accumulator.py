@@ -0,0 +1,63 @@
+from torch_logs.imports import *
+from torch_logs.accumulator import EpochLosses, LossAccumulator
+
+from .fixtures import *
+
+
+def test_loss_accumulator_matches_numpy() -> None:
+    accumulator = LossAccumulator()
+    values = np.random.rand(50, 2)
+
+    for start, end in [(0, 1), (1, 21), (21, 50)]:
+        window, seen = values[start:end], values[:end]
+        for a, b in window:
+            accumulator.add(dict(a=torch.tensor(a), objective=b))
+
+        means, statistics = accumulator.statistics()
+        assert len(accumulator) == 0
+        assert statistics["steps"] == len(window)
+
+        for k, key in enumerate(["a", "objective"]):
+            assert np.isclose(float(means[key]), window[:, k].mean())
+            assert np.isclose(float(statistics[f"{key}_min"]), window[:, k].min())
+            assert np.isclose(float(statistics[f"{key}_max"]), window[:, k].max())
+            assert np.isclose(
+                float(statistics[f"{key}_expanding_mean"]), seen[:, k].mean()
+            )
+            if len(window) > 1:
+                assert np.isclose(
+                    float(statistics[f"{key}_std"]), window[:, k].std(ddof=1)
+                )
+                assert np.isclose(
+                    float(statistics[f"{key}_expanding_std"]), seen[:, k].std(ddof=1)
+                )
+
+
+def test_epoch_losses() -> None:
+    epoch_losses = EpochLosses()
+    for a in [1.0, 2.0]:
+        epoch_losses.add(dict(a=torch.tensor(a), objective=2 * a))
+    assert epoch_losses.sums() == dict(a=3.0, objective=6.0)
+
+    # A resumed epoch of 4 steps only took the last 2, averaged over all 4 by the loop
+    epoch_losses.reset(epoch_losses.sums())
+    epoch_losses.add(dict(a=torch.tensor(5.0), objective=10.0))
+    assert epoch_losses.sums() == dict(a=8.0, objective=16.0)
+    assert epoch_losses.complete(dict(a=5.0 / 4), 4) == dict(a=2.0)
+
+
+def test_loss_accumulator_state() -> None:
+    full, split = LossAccumulator(), LossAccumulator()
+    for a in [1.0, 2.0, 4.0]:
+        full.add(dict(a=a))
+        split.add(dict(a=a))
+    full.statistics(), split.statistics()
+    full.add(dict(a=8.0))
+    split.add(dict(a=8.0))
+
+    # A restored accumulator carries on with the open window and the expanding statistics
+    restored = LossAccumulator()
+    restored.load_state(split.state())
+    restored.add(dict(a=16.0))
+    full.add(dict(a=16.0))
+    assert restored.statistics() == full.statistics()
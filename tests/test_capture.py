@@ -0,0 +1,39 @@
+from torch_logs.imports import *
+from torch_logs.capture import OutputCapture, RotatingSink
+
+import gzip
+
+from .fixtures import *
+
+
+def test_output_capture(tmp_dir) -> None:
+    capture = OutputCapture(".").start()
+    try:
+        print("to stdout")
+        print("to stderr", file=sys.stderr)
+        logging.getLogger("torch_loops").info("to loops")
+        capture.flush()
+
+        with open("stdout.log") as file:
+            assert file.read() == "to stdout\n"
+        with open("stderr.log") as file:
+            assert file.read() == "to stderr\n"
+        with open("loops.log") as file:
+            assert file.read().endswith("INFO to loops\n")
+    finally:
+        capture.close()
+
+    assert not hasattr(sys.stdout, "capture")
+
+
+def test_rotating_sink(tmp_dir) -> None:
+    sink = RotatingSink("out.log", max_bytes=10, backups=2, compress=True)
+    for i in range(4):
+        sink.write(f"line {i:04d}\n")
+    sink.close()
+
+    assert sorted(os.listdir()) == ["out.log", "out.log.1.gz", "out.log.2.gz"]
+    with gzip.open("out.log.1.gz", "rt") as file:
+        assert file.read() == "line 0003\n"
+    with gzip.open("out.log.2.gz", "rt") as file:
+        assert file.read() == "line 0002\n"
@@ -0,0 +1,105 @@
+from torch_logs.imports import *
+from torch_logs.checkpoints import CheckpointIndex, CheckpointWriter
+
+from .fixtures import *
+
+
+def test_checkpoint_writer(tmp_dir, model) -> None:
+    checkpoints = CheckpointWriter()
+    expected = model.weight.detach().clone()
+    os.mkdir("old")
+
+    checkpoints.save(".", {"model.pt": model, "weights.pt": model.state_dict()})
+    removed = checkpoints.remove(["old"])
+    with torch.no_grad():
+        model.weight.add_(1.0)  # The snapshot was taken before this update
+    checkpoints.wait()
+
+    # Waiting covers the callbacks queued after the writes too
+    assert checkpoints.pending() == []
+    assert removed.done() and not os.path.exists("old")
+    assert not any(name.endswith(".tmp") for name in os.listdir())
+
+    loaded = torch.load("model.pt", weights_only=False)
+    assert isinstance(loaded.weight, nn.Parameter)
+    assert torch.equal(loaded.weight, expected)
+    assert torch.equal(torch.load("weights.pt")["weight"], expected)
+
+    # The host buffers are reused by the next checkpoint
+    os.mkdir("next")
+    checkpoints.save("next", {"model.pt": model, "weights.pt": model.state_dict()})
+    checkpoints.close()
+
+    assert torch.equal(torch.load("next/weights.pt")["weight"], expected + 1.0)
+    assert torch.equal(torch.load("weights.pt")["weight"], expected)
+
+
+def test_checkpoint_index(tmp_dir) -> None:
+    for num in range(3):
+        os.makedirs(f"checkpoints/{num:05d}")
+
+    # Runs without an index are scanned once
+    index = CheckpointIndex("checkpoints")
+    assert index.latest()["number"] == 2
+    assert index.next_number() == 3
+
+    for num, score in [(3, 0.5), (4, 0.1), (5, 0.9)]:
+        os.makedirs(f"checkpoints/{num:05d}")
+        index.add(num, iteration=num * 100, scores=dict(loss=score))
+    index.complete(5)
+
+    assert CheckpointIndex("checkpoints").latest()["number"] == 5
+    assert index.latest()["bytes"] == 0
+    assert index.best("loss")["number"] == 4
+    assert index.best("loss", mode="max")["number"] == 5
+    assert index.nearest(330)["number"] == 3
+
+    removed = index.prune(keep_last=1, keep_best=1, score="loss")
+    assert [os.path.basename(path) for path in removed] == [
+        "00000",
+        "00001",
+        "00002",
+        "00003",
+    ]
+    assert [e["number"] for e in index.entries] == [4, 5]
+
+    # Checkpoints still being written are not looked up, but keep their number
+    index.add(6, iteration=600, scores=dict(loss=0.0), complete=False)
+    assert index.latest()["number"] == 5
+    assert index.best("loss")["number"] == 4
+    assert index.next_number() == 7
+    assert index.prune(keep_last=1) == [index.path_of(dict(number=4))]
+    assert index.discard_incomplete() == [index.path_of(dict(number=6))]
+    assert [e["number"] for e in index.entries] == [5]
+
+    checkpoints = CheckpointWriter()
+    checkpoints.remove(removed)
+    checkpoints.close()
+    assert sorted(os.listdir("checkpoints")) == ["00004", "00005", "index.json"]
+
+
+def test_checkpoint_writer_errors(tmp_dir, model) -> None:
+    checkpoints = CheckpointWriter()
+    called = []
+    os.mkdir("kept")
+
+    checkpoints.save("missing", {"weights.pt": model.state_dict()})
+    skipped = checkpoints.then(called.append, True)
+    removed = checkpoints.remove(["kept"])
+
+    # The error of the background write is raised on the training thread
+    with pytest.raises(FileNotFoundError):
+        checkpoints.wait()
+    assert isinstance(skipped.exception(), RuntimeError)
+    assert isinstance(removed.exception(), RuntimeError)
+    assert called == [] and os.path.isdir("kept")
+
+    # Once raised, the next checkpoints are written as usual
+    checkpoints.save(".", {"weights.pt": model.state_dict()})
+    checkpoints.then(called.append, True)
+    checkpoints.close()
+    assert called == [True] and os.path.exists("weights.pt")
+
+    checkpoints.save("missing", {"weights.pt": model.state_dict()})
+    with pytest.raises(FileNotFoundError):
+        checkpoints.close()
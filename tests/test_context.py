@@ -0,0 +1,60 @@
+import contextvars, threading
+
+import torch_logs.logger as logger
+from torch_logs.imports import *
+from torch_logs.context import current_directory, directory, resolve
+from torch_logs.metrics import read_metrics
+
+from .fixtures import *
+
+
+def test_directory(tmp_dir) -> None:
+    cwd = os.getcwd()
+
+    with directory("a/b") as exists_already:
+        assert not exists_already
+        # The working directory never changes
+        assert os.getcwd() == cwd
+        assert current_directory() == f"{cwd}/a/b"
+        assert resolve("../c.txt") == f"{cwd}/a/c.txt"
+
+        with directory("..") as exists_already:
+            assert exists_already
+            assert current_directory() == f"{cwd}/a"
+
+    assert current_directory() == cwd
+
+
+def test_resolve_absolute_paths(tmp_dir, monkeypatch) -> None:
+    def deleted() -> str:
+        raise FileNotFoundError("The working directory was deleted")
+
+    root = os.getcwd()
+
+    # Absolute paths resolve even once the working directory is gone
+    monkeypatch.setattr(os, "getcwd", deleted)
+    assert resolve("/a/b/../c.txt") == "/a/c.txt"
+    with directory(f"{root}/a"):
+        assert resolve("b.txt") == f"{root}/a/b.txt"
+
+
+def test_directories_per_thread(tmp_dir) -> None:
+    def run(name: str) -> None:
+        with directory(name):
+            for i in range(100):
+                logger.log_losses({"loss": torch.tensor(float(i))})
+            logger.log_pid()
+
+    threads = [
+        threading.Thread(target=contextvars.copy_context().run, args=(run, f"run{n}"))
+        for n in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for n in range(4):
+        assert len(read_metrics(f"run{n}/training_losses.metrics")) == 100
+        assert os.path.exists(f"run{n}/pid.txt")
+    assert not os.path.exists("training_losses.metrics")
@@ -0,0 +1,56 @@
+from torch_logs.imports import *
+from torch_logs.distributed import (
+    all_reduce_losses,
+    broadcast_object,
+    is_main_process,
+    world_size,
+)
+
+import torch.distributed as dist
+import torch.multiprocessing as mp
+
+from .fixtures import *
+
+
+def _reduce_on_rank(rank: int, init_file: str, results: Any) -> None:
+    dist.init_process_group(
+        "gloo", init_method=f"file://{init_file}", rank=rank, world_size=2
+    )
+    try:
+        training, validation = all_reduce_losses(
+            dict(a=torch.tensor(float(rank)), b=torch.tensor(2.0 * rank)),
+            dict(a=float(rank + 1)),
+        )
+        results.put(
+            (
+                rank,
+                is_main_process(),
+                world_size(),
+                broadcast_object(f"from {rank}"),
+                {k: float(v) for k, v in training.items()},
+                {k: float(v) for k, v in validation.items()},
+            )
+        )
+    finally:
+        dist.destroy_process_group()
+
+
+def test_all_reduce_losses(tmp_dir) -> None:
+    results = mp.get_context("spawn").SimpleQueue()
+    mp.spawn(
+        _reduce_on_rank, args=(os.path.abspath("init"), results), nprocs=2, join=True
+    )
+
+    for _ in range(2):
+        rank, is_main, size, broadcast, training, validation = results.get()
+        assert is_main == (rank == 0)
+        assert size == 2
+        assert broadcast == "from 0"
+        assert training == dict(a=0.5, b=1.0)
+        assert validation == dict(a=1.5)
+
+
+def test_all_reduce_losses_without_distributed() -> None:
+    losses = dict(a=torch.tensor(1.0))
+    assert all_reduce_losses(losses) == (losses,)
+    assert is_main_process()
@@ -0,0 +1,35 @@
+from torch_logs.imports import *
+
+from .fixtures import *
+
+HEAVY_MODULES = ["pandas", "plotly", "torchvision", "torch_loops"]
+
+
+def test_import_is_lazy() -> None:
+    # * In a fresh interpreter, since the tests themselves import the heavy modules
+    script = "; ".join(
+        [
+            "import sys, time, torch",
+            "start = time.perf_counter()",
+            "import torch_logs",
+            "print(time.perf_counter() - start)",
+            f"print(','.join(m for m in {HEAVY_MODULES} if m in sys.modules))",
+        ]
+    )
+    seconds, loaded = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=os.environ | {"PYTHONPATH": os.pathsep.join(sys.path)},
+    ).stdout.splitlines()
+
+    assert loaded == ""
+    assert float(seconds) < 1.0, f"`import torch_logs` took {seconds}s on top of torch"
+
+
+def test_lazy_module_loads_on_use() -> None:
+    frame = pd.DataFrame(dict(a=[1.0]))
+
+    assert "pandas" in sys.modules
+    assert frame["a"].sum() == 1.0
@@ -0,0 +1,24 @@
+from torch_logs.imports import *
+from torch_logs.memory import MemoryMonitor
+from torch_logs.metrics import read_metrics
+
+import torch_logs.logger as logger
+
+from .fixtures import *
+
+
+def test_memory_monitor(tmp_dir) -> None:
+    monitor = MemoryMonitor()
+
+    logger.log_memory(monitor)
+    logger.log_memory(monitor)
+
+    memory = read_metrics("memory.metrics")
+    assert len(memory) == 2
+    assert list(memory.dtype.names)[:2] == ["time", "rss"]
+    assert (memory["rss"] > 0).all()
+    assert monitor.peaks["rss"] == memory["rss"].max()
+
+    logger.log_max_memory(monitor)
+    with open("max_memory.txt") as file:
+        assert file.readline().startswith("rss ")
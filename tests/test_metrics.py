@@ -0,0 +1,75 @@
+from torch_logs.imports import *
+from torch_logs.metrics import (
+    MetricStore,
+    read_metrics,
+    read_frame,
+    export_csv,
+    metric_offsets,
+    truncate_metrics,
+)
+
+from .fixtures import *
+
+
+def test_metric_store(tmp_dir) -> None:
+    with MetricStore("losses.metrics", ["a", "b"]) as store:
+        store.append([1.0, 3.0], [2.0, 4.0])
+
+    metrics = read_metrics("losses.metrics")
+    assert len(metrics) == 2
+    assert list(metrics["a"]) == [1.0, 2.0]
+    assert list(metrics["b"]) == [3.0, 4.0]
+
+    # Reopening appends to the existing rows
+    with MetricStore("losses.metrics") as store:
+        assert store.columns == ["a", "b"]
+        store.append([5.0, 6.0])
+
+    assert list(read_frame("losses.metrics")["b"]) == [3.0, 4.0, 6.0]
+
+
+def test_metric_store_ignores_partial_rows(tmp_dir) -> None:
+    with MetricStore("losses.metrics", ["a"], dtype="<f4") as store:
+        store.append([1.0])
+
+    with open("losses.metrics", "ab") as file:
+        file.write(b"\x00\x00")
+
+    assert list(read_metrics("losses.metrics")["a"]) == [1.0]
+
+    with MetricStore("losses.metrics") as store:
+        store.append([2.0])
+
+    assert list(read_metrics("losses.metrics")["a"]) == [1.0, 2.0]
+
+
+def test_export_csv(tmp_dir, losses) -> None:
+    with MetricStore("losses.metrics", losses.columns) as store:
+        store.append(*losses.values.tolist())
+
+    lines = iter(open(export_csv("losses.metrics"), "r"))
+    assert next(lines) == "a,b\n"
+    assert next(lines) == "1.0,3.0\n"
+    assert next(lines) == "2.0,4.0\n"
+
+    with pytest.raises(StopIteration):
+        next(lines)
+
+
+def test_truncate_metrics(tmp_dir) -> None:
+    with MetricStore("losses.metrics", ["a"]) as store:
+        store.append([1.0], [2.0])
+
+    offsets = metric_offsets(".")
+    assert offsets["losses.metrics"]["rows"] == 2
+    assert offsets["losses.metrics"]["bytes"] == os.path.getsize("losses.metrics")
+
+    with MetricStore("losses.metrics") as store:
+        store.append([3.0])
+    with MetricStore("scores.metrics", ["b"]) as store:
+        store.append([4.0])
+
+    truncate_metrics(offsets, ".")
+
+    assert list(read_metrics("losses.metrics")["a"]) == [1.0, 2.0]
+    assert not os.path.exists("scores.metrics")
@@ -0,0 +1,41 @@
+from torch_logs.imports import *
+from torch_logs.context import resolve
+from torch_logs.plotting import PlotScheduler
+
+from .fixtures import *
+
+
+def write_plot(content: str) -> None:
+    # The worker never changes its working directory, so paths go through resolve
+    with open(resolve("plot.txt"), "a") as file:
+        print(content, file=file)
+
+
+def fail_plot() -> None:
+    raise ValueError("fail")
+
+
+def test_plot_scheduler(tmp_dir) -> None:
+    plots = PlotScheduler()
+
+    for i in range(20):
+        plots.submit(write_plot, str(i))
+    plots.wait()
+
+    lines = open("plot.txt", "r").read().splitlines()
+    # Stale requests are dropped, but the latest one is always rendered
+    assert 1 <= len(lines) <= 20
+    assert lines[-1] == "19"
+
+    plots.close()
+
+
+def test_plot_scheduler_survives_errors(tmp_dir) -> None:
+    plots = PlotScheduler()
+
+    plots.submit(fail_plot)
+    plots.wait()
+    plots.submit(write_plot, "ok")
+    plots.close()
+
+    assert open("plot.txt", "r").read() == "ok\n"
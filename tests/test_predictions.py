@@ -0,0 +1,65 @@
+from torch_logs.imports import *
+import torch_logs.logger as logger
+from torch_logs.predictions import (
+    PredictionArchive,
+    PredictionArchiveWriter,
+    PredictionExporter,
+    encode_png,
+)
+
+from .fixtures import *
+
+
+def test_prediction_exporter(tmp_dir) -> None:
+    preds = {"image": torch.rand(4, 3, 2, 2), "mask": [torch.rand(4, 1, 2, 2)]}
+
+    with PredictionExporter(save_image, max_workers=2, max_pending=2) as exporter:
+        for j in range(3):
+            logger.log_predictions(j, preds, save_image, exporter=exporter)
+
+    assert exporter.count == 24
+    assert sorted(os.listdir("0000"))[:2] == ["000000__image.png", "000000__mask_0.png"]
+    assert os.path.exists("0000/000011__mask_0.png")
+
+
+def test_prediction_exporter_raises_errors(tmp_dir) -> None:
+    def fail(item: Any, path: str) -> None:
+        raise ValueError(path)
+
+    exporter = PredictionExporter(fail)
+    exporter.export(0, torch.rand(2, 1))
+
+    with pytest.raises(ValueError):
+        exporter.close()
+
+
+def test_prediction_archive(tmp_dir) -> None:
+    preds = {"image": torch.rand(4, 3, 2, 2), "mask": [torch.rand(4, 1, 2, 2)]}
+
+    with PredictionArchiveWriter("archive", shard_bytes=4096, max_workers=2) as writer:
+        for j in range(3):
+            logger.log_predictions(j, preds, save_image, exporter=writer)
+
+    assert len([name for name in os.listdir("archive") if name.endswith(".tar")]) > 1
+
+    archive = PredictionArchive("archive")
+    assert len(archive) == 24
+    assert archive.read(5, "_image") == encode_png(preds["image"][1:2])
+
+    assert archive.extract("extracted") == 24
+    with open("extracted/0000/000011__mask_0.png", "rb") as file:
+        assert file.read() == encode_png(preds["mask"][0][3:4])
+
+
+def test_prediction_archive_uses_save_prediction(tmp_dir) -> None:
+    from torch_logs.validation import prediction_exporter
+
+    def save_text(item: torch.Tensor, path: str) -> None:
+        with open(path, "w") as file:
+            file.write(str(item.shape))
+
+    writer = prediction_exporter(save_text, 1, 4096)
+    writer.export(0, torch.rand(2, 3, 2, 2))
+    writer.close()
+
+    assert PredictionArchive(".").read(1) == b"torch.Size([1, 3, 2, 2])"
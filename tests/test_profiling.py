@@ -0,0 +1,31 @@
+import json
+
+from torch_logs.imports import *
+from torch_logs.profiling import StepProfiler, export_profile
+
+from .fixtures import *
+
+
+def test_step_profiler(tmp_dir, model) -> None:
+    profiler = StepProfiler()
+    for _ in range(3):
+        assert not profiler.step(0.01)
+
+    profiler.start("profile", 2)
+    assert profiler.directory == os.path.abspath("profile")
+    for steps in range(2):
+        model(torch.ones(4, 2)).sum().backward()
+        assert profiler.step(0.02) == (steps == 1)
+
+    profile, directory, overhead = profiler.stop()
+    assert profiler.directory is None and profiler.stop() is None
+    assert overhead["steps"] == 2
+    assert overhead["slowdown"] == pytest.approx(1.0)
+
+    export_profile(profile, directory, overhead)
+    with open("profile/trace.json") as file:
+        assert len(json.load(file)["traceEvents"]) > 0
+    with open("profile/operators.txt") as file:
+        assert "aten::" in file.read()
+    with open("profile/overhead.json") as file:
+        assert json.load(file)["steps"] == 2
@@ -0,0 +1,41 @@
+from torch_logs.imports import *
+from torch_logs.metrics import MetricStore
+from torch_logs.runs import RunIndex
+
+from .fixtures import *
+
+
+def _make_run(path: str, losses: list[float], progress: str) -> None:
+    os.makedirs(path)
+    with MetricStore(f"{path}/training_losses.metrics", ["objective"]) as store:
+        store.append(*[[loss] for loss in losses])
+    with open(f"{path}/progress.txt", "w") as file:
+        print("2024-01-01T00:00:00", file=file)
+        print(progress, file=file)
+    with open(f"{path}/comment.txt", "w") as file:
+        file.write(path)
+
+
+def test_run_index(tmp_dir) -> None:
+    _make_run("sweep/a", [3.0, 1.0, 2.0], "100.0%")
+    _make_run("sweep/b", [4.0, 0.5], "50.0%")
+    os.symlink("a", "sweep/latest")
+
+    index = RunIndex("sweep", workers=2)
+    frame = index.frame().set_index("run")
+
+    assert list(frame.index) == ["a", "b"]
+    assert frame.loc["a", "training_losses.objective.final"] == 2.0
+    assert frame.loc["a", "training_losses.objective.best"] == 1.0
+    assert frame.loc["b", "training_losses.objective.best"] == 0.5
+    assert frame.loc["a", "status"] == "finished"
+    assert frame.loc["b", "status"] == "stopped"
+    assert frame.loc["b", "comment"] == "sweep/b"
+
+    # Cached summaries are only read again once their files change
+    with MetricStore("sweep/b/training_losses.metrics") as store:
+        store.append([0.25])
+
+    frame = RunIndex("sweep").frame().set_index("run")
+    assert frame.loc["b", "training_losses.objective.best"] == 0.25
+    assert frame.loc["b", "training_losses_rows"] == 3
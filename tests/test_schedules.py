@@ -0,0 +1,78 @@
+import pickle, time
+
+from torch_logs.imports import *
+from torch_logs.schedules import (
+    AllOf,
+    AnyOf,
+    EveryInterval,
+    EveryIterations,
+    Once,
+    WithinBudget,
+)
+
+from .fixtures import *
+
+
+def test_every_iterations() -> None:
+    schedule = EveryIterations(3)
+
+    assert schedule.deterministic
+    assert [i for i in range(10) if schedule.due(i)] == [0, 3, 6, 9]
+
+
+def test_every_interval() -> None:
+    schedule = EveryInterval(0.05)
+
+    assert schedule.due(0)
+    schedule.triggered(0, 0.0)
+    assert not schedule.due(1)
+    time.sleep(0.06)
+    assert schedule.due(2)
+
+    # Intervals start over once unpickled
+    schedule.triggered(2, 0.0)
+    assert pickle.loads(pickle.dumps(schedule)).due(3)
+
+
+def test_within_budget() -> None:
+    schedule = WithinBudget(0.1, max_seconds=60.0)
+
+    assert schedule.due(0)
+    schedule.triggered(0, 0.01)
+    # An event taking 10 ms may happen every 100 ms to take 10% of the time
+    assert schedule.wait() == pytest.approx(0.09)
+    assert not schedule.due(1)
+
+    schedule.triggered(1, 100.0)
+    assert schedule.wait() == 60.0
+
+
+def test_any_of() -> None:
+    schedule = AnyOf(EveryIterations(100), EveryInterval(3600.0))
+
+    assert not schedule.deterministic
+    assert schedule.due(0)
+    schedule.triggered(0, 0.0)
+    assert not schedule.due(1)
+    assert schedule.due(100)
+
+
+def test_all_of() -> None:
+    schedule = AllOf(EveryIterations(2), WithinBudget(0.5))
+
+    assert not schedule.deterministic
+    assert schedule.due(0)
+    schedule.triggered(0, 0.05)
+    # Every other iteration, but only once the event took half of the time
+    assert not schedule.due(1) and not schedule.due(2)
+    time.sleep(0.06)
+    assert not schedule.due(3)
+    assert schedule.due(4)
+
+
+def test_once() -> None:
+    schedule = Once(after=5)
+
+    assert [i for i in range(10) if schedule.due(i)] == list(range(5, 10))
+    schedule.triggered(5, 0.0)
+    assert not schedule.due(6)
@@ -0,0 +1,49 @@
+from torch_logs.imports import *
+from torch_logs.metrics import MetricStore
+from torch_logs.series import DownsampledSeries, MetricCurves
+
+from .fixtures import *
+
+
+def test_downsampled_series_is_bounded() -> None:
+    series = DownsampledSeries(max_buckets=8)
+    values = np.arange(1000, dtype=np.float64)
+
+    for chunk in np.array_split(values, 37):
+        series.extend(chunk)
+
+    assert len(series) == len(values)
+    assert len(series.counts) <= 8
+    assert series.mins[0] == 0.0 and series.maxs[-1] == 999.0
+    assert series.sums.sum() == values.sum()
+    assert series.expanding_means()[-1] == values.mean()
+
+
+def test_downsampled_series_matches_one_shot() -> None:
+    incremental = DownsampledSeries(max_buckets=16)
+    one_shot = DownsampledSeries(max_buckets=16)
+    values = np.random.rand(500)
+
+    for value in values:
+        incremental.extend([value])
+    one_shot.extend(values)
+
+    assert (incremental.counts == one_shot.counts).all()
+    assert np.allclose(incremental.means(), one_shot.means())
+
+
+def test_metric_curves_only_reads_new_rows(tmp_dir) -> None:
+    curves = MetricCurves("losses.metrics")
+    assert curves.update().series == {}
+
+    with MetricStore("losses.metrics", ["a"]) as store:
+        store.append([1.0], [2.0])
+        assert curves.update().rows == 2
+
+        store.append([3.0])
+        assert curves.update().rows == 3
+        assert list(curves.series["a"].means()) == [1.0, 2.0, 3.0]
+
+        store.truncate(1)
+        assert curves.update().rows == 1
+        assert list(curves.series["a"].means()) == [1.0]
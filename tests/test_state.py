@@ -0,0 +1,61 @@
+import random
+
+from torch.utils.data import DataLoader, Dataset
+
+from torch_logs.imports import *
+from torch_logs.state import SkippedBatches, rng_state, set_rng_state
+
+from .fixtures import *
+
+
+class Samples(Dataset):
+    def __init__(self) -> None:
+        self.loaded: list[int] = []
+
+    def __len__(self) -> int:
+        return 8
+
+    def __getitem__(self, index: int) -> int:
+        self.loaded.append(index)
+        return index
+
+
+def test_skipped_batches() -> None:
+    dataset = Samples()
+    torch.manual_seed(0)
+    order = [batch.tolist() for batch in DataLoader(dataset, 2, shuffle=True)]
+
+    dataset.loaded.clear()
+    started = []
+    torch.manual_seed(0)
+    batches = SkippedBatches(
+        DataLoader(dataset, 2, shuffle=True), 3, lambda: started.append(True)
+    )
+
+    assert len(batches) == 4
+    assert [batch.tolist() for batch in batches] == order[3:]
+    # The samples of the skipped batches are never loaded
+    assert sorted(dataset.loaded) == sorted(order[3])
+    assert started == [True]
+
+
+def test_skipped_batches_of_iterables() -> None:
+    started = []
+    batches = SkippedBatches(range(5), 2, lambda: started.append(True))
+
+    assert list(batches) == [2, 3, 4]
+    assert started == [True]
+
+    # Called even when every batch is skipped
+    assert list(SkippedBatches(range(2), 2, lambda: started.append(True))) == []
+    assert started == [True, True]
+
+
+def test_rng_state() -> None:
+    state = rng_state()
+    drawn = (torch.rand(3), np.random.rand(3), random.random())
+
+    set_rng_state(state)
+    assert torch.equal(torch.rand(3), drawn[0])
+    assert np.array_equal(np.random.rand(3), drawn[1])
+    assert random.random() == drawn[2]
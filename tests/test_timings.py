@@ -0,0 +1,39 @@
+from torch_logs.imports import *
+from torch_logs.timings import Histogram, TimedIterable, Timings, timed
+
+from .fixtures import *
+
+
+@timed
+def recursive(n: int) -> int:
+    return 0 if n == 0 else recursive(n - 1) + 1
+
+
+def test_histogram() -> None:
+    histogram = Histogram()
+    for ms in [1, 1, 1, 1, 1, 1, 1, 1, 1, 100]:
+        histogram.add(ms / 1e3)
+
+    assert histogram.count == 10
+    assert histogram.quantile(0.5) < 2e-3
+    assert histogram.quantile(1.0) == histogram.max == 0.1
+
+
+def test_timings(tmp_dir) -> None:
+    timings = Timings()
+
+    with timings.activate():
+        for _ in TimedIterable(range(3), timings, "data"):
+            with timings.measure("TICK", overhead=True):
+                recursive(3)
+    recursive(3)  # Not timed outside of `activate`
+
+    report = timings.write("timings")
+
+    assert report["phases"]["data"]["count"] == 4
+    assert report["phases"]["TICK"]["count"] == 3
+    # Only the outermost call of a recursive logger function is timed
+    assert report["phases"]["logger.recursive"]["count"] == 3
+    assert 0.0 < report["overhead"] < 1.0
+    assert os.path.exists("timings.json")
+    assert os.path.exists("timings.txt")
@@ -0,0 +1,242 @@
+import pytest
+
+torch_loops = pytest.importorskip("torch_loops")
+
+from torch.utils.data import DataLoader, TensorDataset
+
+from torch_logs import EveryIterations, LogEvent, Training
+from torch_logs.imports import *
+from torch_logs.metrics import read_metrics
+
+from .fixtures import *
+
+
+def mse(preds: torch.Tensor, targets: torch.Tensor) -> torch.Tensor:
+    return ((preds - targets) ** 2).mean()
+
+
+def touch(item: torch.Tensor, path: str) -> None:
+    open(path, "w").close()
+
+
+def training(
+    path: str, max_iters: int = 20, shuffle_seed: Optional[int] = None, **options: Any
+) -> Training:
+    generator = torch.Generator().manual_seed(0)
+    dataset = TensorDataset(
+        torch.randn(32, 2, generator=generator), torch.randn(32, 1, generator=generator)
+    )
+    dataloader = DataLoader(
+        dataset,
+        batch_size=4,
+        shuffle=True,
+        generator=(
+            torch.Generator().manual_seed(shuffle_seed)
+            if shuffle_seed is not None
+            else None
+        ),
+    )
+
+    torch.manual_seed(1)
+    model = nn.Sequential(nn.Linear(2, 8), nn.Dropout(0.5), nn.Linear(8, 1))
+    optimizer = torch.optim.Adam(model.parameters(), lr=0.01)
+
+    return Training(
+        path,
+        None,
+        max_iters,
+        torch_loops.TrainingLoop(
+            model,
+            dataloader=dataloader,
+            criterions={"mse": (1.0, mse)},
+            optimizers=[optimizer],
+            amp=False,
+        ),
+        torch_loops.EvaluationLoop(
+            model,
+            dataloader=DataLoader(dataset, batch_size=4, shuffle=True),
+            metrics={"mse": mse},
+            amp=False,
+        ),
+        **(
+            dict(
+                tick_frequency=1,
+                progress_frequency=10,
+                checkpoint_frequency=3,
+                save_prediction=touch,
+                prediction_workers=0,
+                async_plots=False,
+                html_plots=False,
+            )
+            | options
+        ),
+    )
+
+
+def iterate(training: Training, checkpoints: Optional[int] = None) -> None:
+    """Iterate the training, stopping after that many checkpoints if given."""
+    for event in training:
+        if event == LogEvent.CHECKPOINT and checkpoints is not None:
+            checkpoints -= 1
+            if checkpoints == 0:
+                return
+
+
+def weights(training: Training) -> dict[str, torch.Tensor]:
+    return training.training_loop.model.state_dict()
+
+
+def assert_resumed(full: Training, run: Training) -> None:
+    """Check that a resumed training ends as the uninterrupted one did."""
+    for name, value in weights(full).items():
+        assert torch.equal(value, weights(run)[name]), name
+    for name in ["training_losses", "training_loss_statistics", "ticks", "scores"]:
+        assert np.array_equal(
+            read_metrics(f"{full.path}/{name}.metrics"),
+            read_metrics(f"{run.path}/{name}.metrics"),
+        ), name
+
+    # The losses of a resumed epoch are summed in another order
+    expected = read_metrics(f"{full.path}/epoch_losses.metrics")
+    epoch_losses = read_metrics(f"{run.path}/epoch_losses.metrics")
+    assert len(epoch_losses) == len(expected) > 0
+    for name in expected.dtype.names:
+        assert np.allclose(epoch_losses[name], expected[name]), name
+
+
+def test_resume_from_async_checkpoints(tmp_dir) -> None:
+    full = training("full")
+    iterate(full)
+
+    iterate(training("split"), checkpoints=3)
+    split = training("split")
+    iterate(split)
+
+    assert sorted(os.listdir("split/checkpoints")) == sorted(
+        os.listdir("full/checkpoints")
+    )
+    assert_resumed(full, split)
+
+
+def test_resume_within_tick_window(tmp_dir) -> None:
+    # * Checkpoints every 3 steps fall inside the windows of 4 steps of the ticks
+    full = training("full", tick_frequency=4)
+    iterate(full)
+
+    iterate(training("split", tick_frequency=4), checkpoints=3)
+    split = training("split", tick_frequency=4)
+    iterate(split)
+
+    assert_resumed(full, split)
+    statistics = read_metrics("split/training_loss_statistics.metrics")
+    assert list(statistics["steps"]) == [1, 4, 4, 4, 4]
+
+
+def test_resume_with_loader_generator(tmp_dir) -> None:
+    # * The loader shuffles from a generator of its own, which no epoch reseeds
+    full = training("full", shuffle_seed=2)
+    iterate(full)
+
+    # Stopped within the second epoch, whose order is the second one drawn
+    iterate(training("split", shuffle_seed=2), checkpoints=4)
+    split = training("split", shuffle_seed=2)
+    iterate(split)
+
+    assert_resumed(full, split)
+
+
+def test_resume_with_background_work(tmp_dir) -> None:
+    options = dict(async_validation=True, keep_last_checkpoints=2, profile_steps=2)
+
+    full = training("full")
+    iterate(full)
+
+    iterate(training("run", **options), checkpoints=3)
+    run = training("run", **options)
+    iterate(run)
+
+    # Every checkpoint was evaluated by the worker, and all but the last two pruned
+    assert_resumed(full, run)
+    assert sorted(os.listdir("run/checkpoints")) == ["00005", "00006", "index.json"]
+    for number in ["00005", "00006"]:
+        assert os.path.exists(f"run/checkpoints/{number}/profile/trace.json")
+        assert len(os.listdir(f"run/checkpoints/{number}/predictions")) > 0
+
+
+def test_resume_after_kill_while_writing(tmp_dir) -> None:
+    full = training("full")
+    iterate(full)
+
+    # * The writes of the fourth checkpoint never finish before the process is killed
+    script = """
+import os, threading
+import torch_logs.checkpoints as checkpoints
+from tests.test_training import LogEvent, training
+
+write = checkpoints._write
+def blocked_write(directory, *args):
+    if directory.endswith("00003"):
+        threading.Event().wait()
+    write(directory, *args)
+checkpoints._write = blocked_write
+
+count = 0
+for event in training("run"):
+    count += event == LogEvent.CHECKPOINT
+    if count == 4:
+        os._exit(1)
+"""
+    with open("kill.py", "w") as file:
+        file.write(script)
+    killed = subprocess.run(
+        [sys.executable, "kill.py"],
+        env=os.environ
+        | {"PYTHONPATH": os.pathsep.join(map(os.path.abspath, sys.path))},
+    )
+    assert killed.returncode == 1
+    assert os.path.isdir("run/checkpoints/00003")
+
+    run = training("run")
+    iterate(run)
+
+    assert_resumed(full, run)
+
+
+def test_resume_without_training_state(tmp_dir) -> None:
+    full = training("full")
+    iterate(full)
+
+    # Resumed from the latest checkpoint which still has its training state
+    iterate(training("run"), checkpoints=3)
+    os.remove("run/checkpoints/00002/state.pt")
+    run = training("run")
+    iterate(run)
+    assert_resumed(full, run)
+
+    # Or not at all, before any metrics are rolled back
+    iterate(training("other"), checkpoints=1)
+    os.remove("other/checkpoints/00000/state.pt")
+    ticks = len(read_metrics("other/ticks.metrics"))
+    with pytest.raises(RuntimeError):
+        iterate(training("other"))
+    assert len(read_metrics("other/ticks.metrics")) == ticks
+
+
+def test_last_epoch_logged(tmp_dir) -> None:
+    # * Both epochs of 8 batches end exactly when the training does
+    events = list(training("run", max_iters=16))
+
+    assert events.count(LogEvent.EPOCH) == 2
+    assert len(read_metrics("run/epoch_losses.metrics")) == 2
+
+
+def test_logging_budget() -> None:
+    schedules = training(
+        "run", logging_budget=0.3, tick_schedule=EveryIterations(5)
+    )._schedules()
+
+    # Events without a schedule of their own are held to a share of the budget
+    assert repr(schedules[LogEvent.TICK]) == "EveryIterations(5)"
+    every, budget = schedules[LogEvent.CHECKPOINT].schedules
+    assert repr(every) == "EveryIterations(3)"
+    assert budget.budget == pytest.approx(0.1)
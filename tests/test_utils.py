@@ -0,0 +1,61 @@
+from torch_logs.imports import *
+import torch_logs.utils as utils
+from torch_logs.utils import TickBatches, atomic_path, latest_numbered_directory
+
+from .fixtures import *
+
+
+def test_tick_batches_restart() -> None:
+    batches = TickBatches([1, 2, 3])
+
+    assert batches.take(2) == [1, 2]
+    assert batches.take(2) == [3, 1]
+
+
+def test_tick_batches_fixed() -> None:
+    batches = TickBatches([1, 2, 3], fixed=True)
+
+    assert batches.take(1) == [1]
+    assert batches.take(2) == [1, 2]
+    assert batches.take(1) == [1]
+
+
+def test_atomic_path(tmp_dir) -> None:
+    with atomic_path("file.txt") as path:
+        open(path, "w").close()
+        assert not os.path.exists("file.txt")
+    assert os.listdir() == ["file.txt"]
+
+    with pytest.raises(ValueError):
+        with atomic_path("other.txt") as path:
+            open(path, "w").close()
+            raise ValueError
+    assert os.listdir() == ["file.txt"]
+
+
+def test_latest_numbered_directory(tmp_dir) -> None:
+    assert latest_numbered_directory("checkpoints") == -1
+
+    for name in ["00000", "00002", "00001.incomplete", "other"]:
+        os.makedirs(f"checkpoints/{name}")
+
+    assert latest_numbered_directory("checkpoints") == 2
+
+
+def test_capture_text_output(tmp_dir, monkeypatch) -> None:
+    hooks = []
+    monkeypatch.setattr(utils.atexit, "register", hooks.append)
+    monkeypatch.setattr(utils, "_prints_on_quit", False)
+    monkeypatch.setattr(utils, "_capture", None)
+
+    try:
+        first = utils.capture_text_output(unbuffered=False)
+        second = utils.capture_text_output(unbuffered=False)
+        # The older wrappers reuse the running capture
+        assert utils.configure_text_logging() is second
+        assert utils.tee_output() is second
+    finally:
+        utils._capture.close()
+
+    assert first is not second
+    assert sum(hook.__name__ == "<lambda>" for hook in hooks) == 1
@@ -0,0 +1,92 @@
+import pytest
+
+EvaluationLoop = pytest.importorskip("torch_loops").EvaluationLoop
+
+from torch_logs.imports import *
+from torch_logs.validation import ValidationScheduler
+
+from .fixtures import *
+
+
+def mean_prediction(preds: torch.Tensor, targets: torch.Tensor) -> float:
+    return preds.mean()
+
+
+def touch(item: torch.Tensor, path: str) -> None:
+    open(path, "w").close()
+
+
+def test_validation_scheduler(tmp_dir, model) -> None:
+    inputs = torch.ones(4, 2)
+    loop = EvaluationLoop(
+        model,
+        dataloader=[(inputs, inputs)],
+        metrics={"mean": mean_prediction},
+        amp=False,
+    )
+    validations = ValidationScheduler(max_pending=2)
+
+    for number in range(3):
+        os.makedirs(f"checkpoints/{number:05d}")
+        with torch.no_grad():
+            model.weight.fill_(0.0)
+            model.bias.fill_(float(number))
+        torch.save(model.state_dict(), f"checkpoints/{number:05d}/weights.pt")
+        validations.submit(
+            number,
+            f"checkpoints/{number:05d}",
+            loop,
+            save_prediction=touch,
+            prediction_workers=0,
+        )
+        assert len(validations.pending()) <= 2
+
+    # The worker loads the weights of each checkpoint, in order
+    results = validations.wait()
+    validations.close()
+
+    assert [number for number, _, _ in results] == [0, 1, 2]
+    assert [scores for _, scores, _ in results] == [
+        {"mean": float(n)} for n in range(3)
+    ]
+    for number in range(3):
+        assert len(os.listdir(f"checkpoints/{number:05d}/predictions")) > 0
+
+
+def test_validation_scheduler_reports_errors(tmp_dir, model) -> None:
+    loop = EvaluationLoop(
+        model, dataloader=[], metrics={"mean": mean_prediction}, amp=False
+    )
+    validations = ValidationScheduler()
+
+    os.makedirs("missing")
+    validations.submit(0, "missing", loop, prediction_workers=0)
+    ((number, scores, error),) = validations.wait()
+    validations.close()
+
+    assert number == 0 and scores is None and "model.pt" in error
+
+
+def test_validation_scheduler_after_pruning(tmp_dir, model) -> None:
+    inputs = torch.ones(4, 2)
+    loop = EvaluationLoop(
+        model,
+        dataloader=[(inputs, inputs)],
+        metrics={"mean": mean_prediction},
+        amp=False,
+    )
+    validations = ValidationScheduler()
+
+    results = []
+    for number in range(2):
+        os.makedirs(f"checkpoints/{number:05d}")
+        torch.save(model.state_dict(), f"checkpoints/{number:05d}/weights.pt")
+        validations.submit(
+            number, f"checkpoints/{number:05d}", loop, prediction_workers=0
+        )
+        results += validations.wait()
+        # The worker keeps going once the checkpoints it evaluated are pruned
+        shutil.rmtree(f"checkpoints/{number:05d}")
+    validations.close()
+
+    assert [(number, error) for number, _, error in results] == [(0, None), (1, None)]
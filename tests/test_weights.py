@@ -0,0 +1,44 @@
+from torch_logs.imports import *
+from torch_logs.checkpoints import CheckpointWriter
+from torch_logs.weights import WeightFile, load_weights, save_weights
+
+import torch_logs.logger as logger
+
+from .fixtures import *
+
+
+def test_weights_round_trip(tmp_dir) -> None:
+    state_dict = {
+        "weight": torch.randn(3, 5),
+        "transposed": torch.randn(5, 3).t(),
+        "half": torch.randn(7, dtype=torch.bfloat16),
+        "steps": torch.tensor(12),
+        "empty": torch.empty(0, 4),
+    }
+    save_weights(state_dict, "model.tensors")
+
+    loaded = load_weights("model.tensors")
+    assert list(loaded.keys()) == list(state_dict.keys())
+    for name, tensor in state_dict.items():
+        assert loaded[name].dtype == tensor.dtype
+        assert torch.equal(loaded[name], tensor)
+
+    # Writing to a mapped tensor never changes the file
+    loaded["weight"].zero_()
+    assert torch.equal(load_weights("model.tensors")["weight"], state_dict["weight"])
+
+
+def test_log_model_with_mmap_weights(tmp_dir, model) -> None:
+    logger.log_model(model, mmap_weights=True)
+    os.mkdir("async")
+    with logger.directory("async"):
+        checkpoints = CheckpointWriter()
+        logger.log_model(model, checkpoints, mmap_weights=True)
+        checkpoints.close()
+
+    for path in ["weights.tensors", "async/weights.tensors"]:
+        weights = WeightFile(path)
+        assert set(weights) == {"weight", "bias"}
+        fresh = nn.Linear(2, 2)
+        fresh.load_state_dict(weights)
+        assert torch.equal(fresh.weight, model.weight)
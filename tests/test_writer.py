@@ -0,0 +1,61 @@
+from torch_logs.imports import *
+from torch_logs.metrics import read_metrics
+from torch_logs.writer import MetricWriter
+
+from .fixtures import *
+
+
+def test_metric_writer(tmp_dir) -> None:
+    writer = MetricWriter()
+
+    writer.write("losses.metrics", dict(a=torch.tensor(1.0), b=torch.tensor(3.0)))
+    writer.write("losses.metrics", dict(a=torch.tensor(2.0), b=4.0))
+    writer.flush()
+
+    metrics = read_metrics("losses.metrics")
+    assert list(metrics.dtype.names) == ["a", "b"]
+    assert list(metrics["a"]) == [1.0, 2.0]
+    assert list(metrics["b"]) == [3.0, 4.0]
+
+    writer.close()
+
+
+def test_metric_writer_appends_after_close(tmp_dir) -> None:
+    writer = MetricWriter()
+
+    writer.write("losses.metrics", dict(a=1.0))
+    writer.close()
+    writer.write("losses.metrics", dict(a=2.0))
+    writer.close()
+
+    assert list(read_metrics("losses.metrics")["a"]) == [1.0, 2.0]
+
+
+def test_metric_writer_released_after_close(tmp_dir) -> None:
+    import gc, weakref
+
+    writer = MetricWriter()
+    writer.write("losses.metrics", dict(a=1.0))
+    writer.close()
+
+    # Nothing, e.g. an exit hook, keeps closed writers alive
+    reference = weakref.ref(writer)
+    del writer
+    gc.collect()
+    assert reference() is None
+
+
+def test_metric_writer_batch(tmp_dir) -> None:
+    writer = MetricWriter()
+
+    packed = torch.tensor([1.0, 2.0, 3.0])
+    with writer.batch():
+        writer.write("a.metrics", dict(x=packed[0], y=packed[1]))
+        writer.write("b.metrics", dict(z=packed[2], w=4.0))
+    writer.flush()
+
+    assert list(read_metrics("a.metrics")["y"]) == [2.0]
+    assert list(read_metrics("b.metrics")["z"]) == [3.0]
+    assert list(read_metrics("b.metrics")["w"]) == [4.0]
+
+    writer.close()
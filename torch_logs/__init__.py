@@ -1,9 +1,19 @@
 from .imports import *
 
-to_exclude = list(globals().keys())
+# * Keep the module attributes, such as `__path__`, which submodule imports rely on
+to_exclude = [key for key in globals().keys() if not key.startswith("__")]
 
+from .schedules import (
+    AllOf,
+    AnyOf,
+    EveryInterval,
+    EveryIterations,
+    Once,
+    Schedule,
+    WithinBudget,
+)
 from .training import *
 from .utils import *
 
 for key in to_exclude:
-    del globals()[key]
\ No newline at end of file
+    del globals()[key]
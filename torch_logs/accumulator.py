@@ -0,0 +1,189 @@
+from .imports import *
+
+
+class LossAccumulator:
+    """
+    Running statistics of the losses of every training step, kept on their device.
+
+    `add` folds the losses of a step into the count, mean and sum of squared
+    deviations (Welford) of the current window, plus its min and max, without
+    synchronizing. `statistics` closes the window: it merges it into the expanding
+    statistics of the whole run (Chan et al.) and returns both as views of a single
+    tensor, so that logging them costs one copy to the host. Both are saved with
+    the training state, so that a resumed run carries on with the same window.
+    """
+
+    STATISTICS = ("std", "min", "max", "expanding_mean", "expanding_std")
+
+    def __init__(self):
+        self.keys: Optional[list[str]] = None
+        self.count = 0
+        self.total_count = 0
+
+        self._mean: Optional[torch.Tensor] = None
+        self._m2: Optional[torch.Tensor] = None
+        self._min: Optional[torch.Tensor] = None
+        self._max: Optional[torch.Tensor] = None
+        self._total_mean: Optional[torch.Tensor] = None
+        self._total_m2: Optional[torch.Tensor] = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    @torch.no_grad()
+    def add(self, losses: Mapping[str, Any]) -> None:
+        if self.keys is None:
+            self.keys = list(losses.keys())
+        assert (
+            list(losses.keys()) == self.keys
+        ), f"Losses changed from {self.keys} to {list(losses.keys())}"
+
+        x = _stack(losses.values())
+        if self._mean is not None and self._mean.device != x.device:
+            self._to(x.device)
+
+        self.count += 1
+        if self.count == 1:
+            self._mean = x.clone()
+            self._m2 = torch.zeros_like(x)
+            self._min = x.clone()
+            self._max = x.clone()
+            return
+
+        delta = x - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (x - self._mean)
+        torch.minimum(self._min, x, out=self._min)
+        torch.maximum(self._max, x, out=self._max)
+
+    @torch.no_grad()
+    def statistics(self) -> tuple[Losses, Losses]:
+        """
+        Close the window, returning the mean of each loss over it, and the other
+        statistics as `<loss>_<statistic>` along with the number of `steps` in the window.
+        """
+        assert self.count > 0 and self.keys is not None, "No losses were added"
+        assert self._mean is not None and self._m2 is not None
+
+        if self.total_count == 0:
+            self._total_mean = self._mean.clone()
+            self._total_m2 = self._m2.clone()
+        else:
+            assert self._total_mean is not None and self._total_m2 is not None
+            total = self.total_count + self.count
+            delta = self._mean - self._total_mean
+            self._total_mean += delta * (self.count / total)
+            self._total_m2 += self._m2 + delta**2 * (
+                self.total_count * self.count / total
+            )
+        self.total_count += self.count
+
+        packed = torch.cat(
+            [
+                self._mean,
+                (self._m2 / max(self.count - 1, 1)).sqrt(),
+                self._min,  # type: ignore
+                self._max,  # type: ignore
+                self._total_mean,  # type: ignore
+                (self._total_m2 / max(self.total_count - 1, 1)).sqrt(),  # type: ignore
+            ]
+        ).reshape(1 + len(self.STATISTICS), len(self.keys))
+
+        means = dict(zip(self.keys, packed[0]))
+        statistics = {
+            f"{key}_{name}": value
+            for name, row in zip(self.STATISTICS, packed[1:])
+            for key, value in zip(self.keys, row)
+        }
+        statistics["steps"] = float(self.count)
+
+        self.count = 0
+        return means, statistics
+
+    _TENSORS = ("_mean", "_m2", "_min", "_max", "_total_mean", "_total_m2")
+
+    def state(self) -> dict[str, Any]:
+        """The open window and the expanding statistics, to be saved with a checkpoint."""
+        state: dict[str, Any] = dict(
+            keys=self.keys, count=self.count, total_count=self.total_count
+        )
+        for name in self._TENSORS:
+            tensor = getattr(self, name)
+            state[name] = tensor.clone() if tensor is not None else None
+        return state
+
+    def load_state(self, state: Mapping[str, Any]) -> None:
+        """Restore a `state`, whose tensors move to the device of the next losses added."""
+        self.keys, self.count = state["keys"], state["count"]
+        self.total_count = state["total_count"]
+        for name in self._TENSORS:
+            setattr(self, name, state[name])
+
+    def _to(self, device: torch.device) -> None:
+        for name in self._TENSORS:
+            tensor = getattr(self, name)
+            if tensor is not None:
+                setattr(self, name, tensor.to(device))
+
+    def __reduce__(self):
+        return (type(self), ())
+
+
+class EpochLosses:
+    """
+    Sums of the losses of the steps taken in the current epoch, kept on their device.
+
+    A run resumed mid-epoch only iterates over the rest of the epoch, so the sums of
+    the steps before the checkpoint are saved with the training state and passed back
+    to `reset`. `complete` adds them to the epoch losses of the loop, which are
+    averaged over the whole epoch but only summed over the steps it took.
+    """
+
+    def __init__(self):
+        self.keys: Optional[list[str]] = None
+        self.restored: dict[str, float] = {}
+
+        self._sums: Optional[torch.Tensor] = None
+
+    def reset(self, restored: Optional[Mapping[str, float]] = None) -> None:
+        self.keys, self._sums = None, None
+        self.restored = dict(restored or {})
+
+    @torch.no_grad()
+    def add(self, losses: Mapping[str, Any]) -> None:
+        x = _stack(losses.values())
+        if self._sums is None:
+            self.keys, self._sums = list(losses.keys()), x
+        else:
+            self._sums += x
+
+    def sums(self) -> dict[str, float]:
+        """Sums of the losses over the epoch so far, including the restored ones."""
+        sums = dict(self.restored)
+        if self._sums is not None and self.keys is not None:
+            for key, value in zip(self.keys, self._sums.tolist()):
+                sums[key] = sums.get(key, 0.0) + value
+        return sums
+
+    def complete(self, epoch_losses: Losses, steps: int) -> Losses:
+        """The `epoch_losses` of an epoch of `steps` steps, with the restored sums added."""
+        return {
+            key: value + self.restored.get(key, 0.0) / steps
+            for key, value in epoch_losses.items()
+        }
+
+    def __reduce__(self):
+        return (type(self), ())
+
+
+def _stack(values: Iterable[Any]) -> torch.Tensor:
+    values = list(values)
+    device = next(
+        (v.device for v in values if isinstance(v, torch.Tensor)), torch.device("cpu")
+    )
+    return torch.stack(
+        [
+            torch.as_tensor(v, device=device).detach().reshape(()).to(torch.float64)
+            for v in values
+        ]
+    )
@@ -0,0 +1,204 @@
+from .imports import *
+
+import gzip, queue, threading, atexit
+
+from .context import resolve
+
+
+class RotatingSink:
+    """
+    Buffered text file which rotates once it grows past `max_bytes`.
+
+    Rotated files are renamed `<path>.1`, `<path>.2`, ... (gzipped with `compress`),
+    keeping at most `backups` of them.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: Optional[int] = None,
+        backups: int = 5,
+        compress: bool = False,
+    ):
+        self.path = resolve(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.compress = compress
+
+        self._file = open(self.path, "a", buffering=1 << 16)
+        self._size = self._file.tell()
+
+    def write(self, text: str) -> None:
+        self._file.write(text)
+        self._size += len(text)
+
+        if self.max_bytes is not None and self._size >= self.max_bytes:
+            self.rotate()
+
+    def rotate(self) -> None:
+        self._file.close()
+
+        extension = ".gz" if self.compress else ""
+        for n in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{n}{extension}"):
+                os.replace(
+                    f"{self.path}.{n}{extension}", f"{self.path}.{n + 1}{extension}"
+                )
+
+        if self.backups > 0:
+            if self.compress:
+                with open(self.path, "rb") as source, gzip.open(
+                    f"{self.path}.1.gz", "wb"
+                ) as target:
+                    shutil.copyfileobj(source, target)
+            else:
+                os.replace(self.path, f"{self.path}.1")
+
+        self._file = open(self.path, "w", buffering=1 << 16)
+        self._size = 0
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class OutputCapture:
+    """
+    Copies stdout, stderr and the `torch_loops` logger into `stdout.log`, `stderr.log`
+    and `loops.log`, from a listener thread within the process.
+
+    Writes still reach the console directly; the copy for the files is only queued,
+    so a slow disk never blocks the training thread. The sinks are flushed whenever
+    the queue empties, and on `close`, which is registered to run at exit.
+    Only writes made through `sys.stdout` and `sys.stderr` are captured, not those
+    made by native code directly to the file descriptors.
+    """
+
+    def __init__(
+        self,
+        directory: str = ".",
+        max_bytes: Optional[int] = None,
+        backups: int = 5,
+        compress: bool = False,
+    ):
+        self._sinks = {
+            name: RotatingSink(
+                os.path.join(directory, f"{name}.log"), max_bytes, backups, compress
+            )
+            for name in ("stdout", "stderr", "loops")
+        }
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._streams: Optional[tuple[TextIO, TextIO]] = None
+
+        self._handler = _QueueHandler(self)
+        self._handler.setFormatter(
+            logging.Formatter(
+                fmt="%(asctime)s %(levelname)s %(message)s", datefmt="%H:%M:%S"
+            )
+        )
+
+    def start(self) -> "OutputCapture":
+        self._thread = threading.Thread(
+            target=self._run, name="torch_logs.OutputCapture", daemon=True
+        )
+        self._thread.start()
+
+        self._streams = (sys.stdout, sys.stderr)
+        sys.stdout = _CapturedStream(sys.stdout, self, "stdout")  # type: ignore
+        sys.stderr = _CapturedStream(sys.stderr, self, "stderr")  # type: ignore
+
+        py_logger = logging.getLogger("torch_loops")
+        py_logger.addHandler(self._handler)
+        py_logger.setLevel(logging.INFO)
+
+        atexit.register(self.close)
+        return self
+
+    def put(self, sink: str, text: str) -> None:
+        self._queue.put((sink, text))
+
+    def flush(self) -> None:
+        """Wait until everything written so far is in the files."""
+        if self._thread is None:
+            return
+
+        done = threading.Event()
+        self._queue.put((None, done))
+        done.wait()
+
+    def close(self) -> None:
+        atexit.unregister(self.close)
+
+        logging.getLogger("torch_loops").removeHandler(self._handler)
+        if self._streams is not None:
+            # * Unless they were replaced since, e.g. by pytest
+            if isinstance(sys.stdout, _CapturedStream) and sys.stdout.capture is self:
+                sys.stdout = self._streams[0]
+            if isinstance(sys.stderr, _CapturedStream) and sys.stderr.capture is self:
+                sys.stderr = self._streams[1]
+            self._streams = None
+
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+        for sink in self._sinks.values():
+            sink.close()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            while item is not None:
+                sink, text = item
+                if sink is None:
+                    self._flush_sinks()
+                    text.set()
+                else:
+                    self._sinks[sink].write(text)
+
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            self._flush_sinks()
+            if item is None:
+                return
+
+    def _flush_sinks(self) -> None:
+        for sink in self._sinks.values():
+            sink.flush()
+
+
+class _CapturedStream:
+    def __init__(self, stream: TextIO, capture: OutputCapture, sink: str):
+        self.stream = stream
+        self.capture = capture
+        self.sink = sink
+
+    def write(self, text: str) -> int:
+        self.stream.write(text)
+        self.capture.put(self.sink, text)
+        return len(text)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.stream, name)
+
+
+class _QueueHandler(logging.Handler):
+    def __init__(self, capture: OutputCapture):
+        super().__init__()
+        self.capture = capture
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.capture.put("loops", self.format(record) + "\n")
+        except Exception:
+            self.handleError(record)
@@ -0,0 +1,414 @@
+from .imports import *
+
+import io, json, pickle, atexit, threading, time
+from concurrent import futures
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .context import resolve
+from .utils import atomic_path
+from .weights import save_weights
+
+
+class CheckpointWriter:
+    """
+    Saves files with `torch.save` from a background thread.
+
+    `save` copies every tensor reachable from the objects into host buffers
+    (pinned for CUDA tensors, reused from one checkpoint to the next) and returns
+    as soon as the copies are queued. Serialization, fsync and the atomic rename
+    of each file into place happen in the background. Tensors are saved on the CPU.
+    `then` and `remove` queue callbacks which run once the writes before them are done.
+    An error in the background is raised by the next call to `save`, `wait` or `close`,
+    and the callbacks queued after a failed write are skipped.
+    """
+
+    def __init__(self):
+        self._buffers: dict[str, dict[int, torch.Tensor]] = {}
+        self._pending: dict[str, tuple[str, Future]] = {}
+        self._callbacks: list[Future] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._error: Optional[BaseException] = None
+
+    def save(self, directory: str, files: dict[str, Any]) -> Future:
+        key = ",".join(sorted(files.keys()))
+        # * The buffers of the previous save of these files must be written before reuse
+        if key in self._pending:
+            futures.wait([self._pending.pop(key)[1]])
+        self._raise_pending_error()
+
+        payload, tensors, ready = self._snapshot(key, files)
+
+        directory = resolve(directory)
+        future = self._submit(_write, directory, payload, tensors, ready)
+        self._pending[key] = (directory, future)
+        return future
+
+    def then(self, function: Callable, *args: Any) -> Future:
+        """Call `function` in the background once the pending writes are done."""
+        return self._callback(function, *args)
+
+    def remove(self, directories: Iterable[str]) -> Future:
+        """Delete directories in the background, once the pending writes are done."""
+        directories = [resolve(directory) for directory in directories]
+        return self._callback(_remove, directories)
+
+    def pending(self) -> list[str]:
+        """Directories which still have files being written."""
+        return sorted(
+            {
+                directory
+                for directory, future in self._pending.values()
+                if not future.done()
+            }
+        )
+
+    def wait(self) -> None:
+        """Wait for the pending writes, and the callbacks queued after them."""
+        pending, self._pending = self._pending, {}
+        callbacks, self._callbacks = self._callbacks, []
+        futures.wait([future for _, future in pending.values()] + callbacks)
+        self._raise_pending_error()
+
+    def close(self) -> None:
+        atexit.unregister(self.close)
+
+        try:
+            self.wait()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+        self._raise_pending_error()
+
+    def __reduce__(self):
+        return (type(self), ())
+
+    def _submit(
+        self, function: Callable, *args: Any, after_writes: bool = False
+    ) -> Future:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="torch_logs.CheckpointWriter"
+            )
+            atexit.register(self.close)
+        writes = (
+            [future for _, future in self._pending.values()] if after_writes else []
+        )
+        return self._executor.submit(self._run, writes, function, *args)
+
+    def _callback(self, function: Callable, *args: Any) -> Future:
+        # * Finished callbacks are dropped, so that only those still queued are waited on
+        self._callbacks = [future for future in self._callbacks if not future.done()]
+        future = self._submit(function, *args, after_writes=True)
+        self._callbacks.append(future)
+        return future
+
+    def _run(self, writes: list[Future], function: Callable, *args: Any) -> Any:
+        # * The writes were submitted before, so they are done by now
+        if any(write.exception() is not None for write in writes):
+            raise RuntimeError(
+                f"Skipped {function.__qualname__}, since a checkpoint failed to be written"
+            )
+
+        try:
+            return function(*args)
+        except BaseException as e:
+            # * Kept until raised on the training thread, along with the first error only
+            if self._error is None:
+                self._error = e
+            raise
+
+    def _raise_pending_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _snapshot(
+        self, key: str, files: dict[str, Any]
+    ) -> tuple[bytes, list[torch.Tensor], Optional[Any]]:
+        buffers = self._buffers.setdefault(key, {})
+        tensors: list[torch.Tensor] = []
+        seen: dict[int, tuple] = {}
+        on_device = False
+
+        def persistent_id(obj: Any) -> Optional[tuple]:
+            nonlocal on_device
+
+            if not isinstance(obj, torch.Tensor):
+                return None
+            # * Tensors reachable from several files, or tied, are only copied once
+            if id(obj) in seen:
+                return seen[id(obj)]
+
+            tensor = obj.detach()
+            index = len(tensors)
+
+            if tensor.layout != torch.strided:
+                tensors.append(tensor.to("cpu", copy=True))
+            else:
+                if (
+                    index not in buffers
+                    or buffers[index].shape != tensor.shape
+                    or buffers[index].dtype != tensor.dtype
+                ):
+                    buffers[index] = torch.empty(
+                        tensor.shape, dtype=tensor.dtype, pin_memory=tensor.is_cuda
+                    )
+                buffers[index].copy_(tensor, non_blocking=tensor.is_cuda)
+                tensors.append(buffers[index])
+                on_device |= tensor.is_cuda
+
+            seen[id(obj)] = (index, isinstance(obj, nn.Parameter), obj.requires_grad)
+            return seen[id(obj)]
+
+        payload = io.BytesIO()
+        pickler = pickle.Pickler(payload, protocol=pickle.HIGHEST_PROTOCOL)
+        pickler.persistent_id = persistent_id  # type: ignore
+        pickler.dump(files)
+
+        ready = None
+        if on_device:
+            ready = torch.cuda.Event()
+            ready.record()
+
+        return payload.getvalue(), tensors, ready
+
+
+def _write(
+    directory: str, payload: bytes, tensors: list[torch.Tensor], ready: Optional[Any]
+) -> None:
+    if ready is not None:
+        ready.synchronize()
+
+    def persistent_load(pid: tuple) -> torch.Tensor:
+        index, is_parameter, requires_grad = pid
+        # * Fresh views, so that the buffers themselves never require gradients
+        tensor = tensors[index].detach()
+        if is_parameter:
+            return nn.Parameter(tensor, requires_grad=requires_grad)
+        return tensor.requires_grad_(requires_grad)
+
+    unpickler = pickle.Unpickler(io.BytesIO(payload))
+    unpickler.persistent_load = persistent_load  # type: ignore
+    files = unpickler.load()
+
+    for name, obj in files.items():
+        path = os.path.join(directory, name)
+        temporary = os.path.join(directory, f".{name}.tmp")
+        with open(temporary, "wb") as file:
+            save_file(name, obj, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def save_file(name: str, obj: Any, file: Union[str, BinaryIO]) -> None:
+    """Save with `torch.save`, or as mappable weights for `.tensors` files."""
+    if name.endswith(".tensors"):
+        save_weights(obj, file)
+    else:
+        torch.save(obj, file)
+
+
+def _remove(directories: list[str]) -> None:
+    for directory in directories:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class CheckpointIndex:
+    """
+    Record of the checkpoints of a run, kept in `<directory>/index.json`.
+
+    Each entry holds the number, iteration, time, scores and size of a checkpoint.
+    Checkpoints written in the background are added as incomplete, and marked
+    complete once their files are written: lookups only return complete checkpoints.
+    The index is rewritten atomically on every change and cached in memory by path,
+    so lookups only stat the index file instead of scanning the directory. Runs without
+    an index are scanned once to build it.
+    """
+
+    def __init__(self, directory: str = "checkpoints"):
+        self.directory = resolve(directory)
+        self.path = os.path.join(self.directory, "index.json")
+
+    @property
+    def entries(self) -> list[dict[str, Any]]:
+        with _lock:
+            return list(self._load())
+
+    @property
+    def complete_entries(self) -> list[dict[str, Any]]:
+        return [e for e in self.entries if e.get("complete", True)]
+
+    def latest(self) -> Optional[dict[str, Any]]:
+        entries = self.complete_entries
+        return entries[-1] if len(entries) > 0 else None
+
+    def next_number(self) -> int:
+        # * Incomplete checkpoints keep their number, as their files are being written
+        entries = self.entries
+        return 0 if len(entries) == 0 else entries[-1]["number"] + 1
+
+    def best(self, score: str, mode: str = "min") -> Optional[dict[str, Any]]:
+        assert mode in ("min", "max")
+        entries = [e for e in self.complete_entries if score in e.get("scores", {})]
+        if len(entries) == 0:
+            return None
+        return (min if mode == "min" else max)(
+            entries, key=lambda e: e["scores"][score]
+        )
+
+    def nearest(self, iteration: int) -> Optional[dict[str, Any]]:
+        entries = [e for e in self.complete_entries if e.get("iteration") is not None]
+        if len(entries) == 0:
+            return None
+        return min(entries, key=lambda e: abs(e["iteration"] - iteration))
+
+    def path_of(self, entry: dict[str, Any]) -> str:
+        return os.path.join(self.directory, f"{entry['number']:05d}")
+
+    def add(
+        self,
+        number: int,
+        iteration: Optional[int] = None,
+        scores: Optional[Mapping[str, float]] = None,
+        complete: bool = True,
+    ) -> dict[str, Any]:
+        entry = {
+            "number": number,
+            "iteration": iteration,
+            "time": time.time(),
+            "scores": {key: float(value) for key, value in (scores or {}).items()},
+            "bytes": None,
+            "complete": complete,
+        }
+        with _lock:
+            entries = [e for e in self._load() if e["number"] != number]
+            self._store(sorted(entries + [entry], key=lambda e: e["number"]))
+        return entry
+
+    def update(self, number: int, **fields: Any) -> None:
+        with _lock:
+            self._store(
+                [e | fields if e["number"] == number else e for e in self._load()]
+            )
+
+    def complete(self, number: int) -> None:
+        """Mark the checkpoint as complete once its files are written, recording their size."""
+        directory = os.path.join(self.directory, f"{number:05d}")
+        size = sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(directory)
+            for name in names
+        )
+        self.update(number, bytes=size, complete=True)
+
+    def discard_incomplete(self) -> list[str]:
+        """
+        Drop the checkpoints which were never completed, e.g. by a run killed while
+        writing them, from the index, returning their directories so they can be deleted.
+        """
+        with _lock:
+            entries = self._load()
+            removed = [e for e in entries if not e.get("complete", True)]
+            if len(removed) > 0:
+                self._store([e for e in entries if e.get("complete", True)])
+
+        return [self.path_of(e) for e in removed]
+
+    def discard_after(self, number: int) -> list[str]:
+        """
+        Drop the checkpoints after `number`, e.g. those a run resumed from it writes again,
+        from the index, returning their directories so they can be deleted.
+        """
+        with _lock:
+            entries = self._load()
+            removed = [e for e in entries if e["number"] > number]
+            if len(removed) > 0:
+                self._store([e for e in entries if e["number"] <= number])
+
+        return [self.path_of(e) for e in removed]
+
+    def prune(
+        self,
+        keep_last: int,
+        keep_best: int = 0,
+        score: Optional[str] = None,
+        mode: str = "min",
+        protected: Iterable[int] = (),
+    ) -> list[str]:
+        """
+        Drop all but the last `keep_last` checkpoints, the best `keep_best` by `score`
+        and the `protected` ones from the index, returning their directories so they
+        can be deleted. The latest checkpoint, the latest complete one and incomplete ones
+        are always kept.
+        """
+        assert keep_last >= 1
+        with _lock:
+            entries = self._load()
+            keep = {e["number"] for e in entries[-keep_last:]} | set(protected)
+            # * Checkpoints still being written may yet fail, so the last complete one stays
+            complete = [e["number"] for e in entries if e.get("complete", True)]
+            keep |= {e["number"] for e in entries if e["number"] not in complete}
+            keep |= set(complete[-1:])
+
+            if keep_best > 0 and score is not None:
+                scored = [e for e in entries if score in e.get("scores", {})]
+                scored.sort(key=lambda e: e["scores"][score], reverse=(mode == "max"))
+                keep |= {e["number"] for e in scored[:keep_best]}
+
+            removed = [e for e in entries if e["number"] not in keep]
+            if len(removed) > 0:
+                self._store([e for e in entries if e["number"] in keep])
+
+        return [self.path_of(e) for e in removed]
+
+    def _load(self) -> list[dict[str, Any]]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return self._scan()
+
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = _cache.get(self.path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        with open(self.path) as file:
+            entries = json.load(file)["checkpoints"]
+        _cache[self.path] = (key, entries)
+        return entries
+
+    def _scan(self) -> list[dict[str, Any]]:
+        if not os.path.isdir(self.directory):
+            return []
+
+        # * Checkpoints of a run from before the index existed
+        entries = [
+            {"number": int(name), "iteration": None, "scores": {}, "bytes": None}
+            for name in sorted(os.listdir(self.directory), key=lambda n: (len(n), n))
+            if name.isdigit() and os.path.isdir(os.path.join(self.directory, name))
+        ]
+        if len(entries) > 0:
+            self._store(entries)
+        return entries
+
+    def _store(self, entries: list[dict[str, Any]]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        with atomic_path(self.path) as temporary:
+            with open(temporary, "w") as file:
+                json.dump({"checkpoints": entries}, file, indent=2)
+
+        stat = os.stat(self.path)
+        _cache[self.path] = ((stat.st_mtime_ns, stat.st_size), entries)
+
+
+_lock = threading.RLock()
+_cache: dict[str, tuple[tuple[int, int], list[dict[str, Any]]]] = {}
@@ -0,0 +1,50 @@
+from .imports import *
+
+import contextvars
+
+# * Directories are tracked per context rather than with `os.chdir`, so that several
+# * trainings, and the threads working for them, each see their own
+_directory: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "torch_logs.directory", default=None
+)
+
+
+def current_directory() -> str:
+    """Absolute path of the innermost `directory`, or the working directory outside of any."""
+    return _directory.get() or os.getcwd()
+
+
+def resolve(path: str) -> str:
+    """Absolute path of `path`, taken relative to the current directory."""
+    # * Absolute paths never look up the working directory, which may have been deleted
+    if os.path.isabs(path):
+        return os.path.normpath(path)
+    return os.path.normpath(os.path.join(current_directory(), path))
+
+
+@contextlib.contextmanager
+def directory(path: str) -> Iterator[bool]:
+    """
+    Resolve paths relative to `path` within the block, creating it if needed.
+    Yields whether it existed already. The working directory itself never changes.
+    """
+    path = resolve(path)
+
+    # * Workers started with `python -c`, like notebooks, have no script to be relative to
+    if hasattr(main, "__file__"):
+        path_name = os.path.relpath(
+            path, os.path.dirname(os.path.abspath(main.__file__))
+        )
+    else:
+        path_name = path
+    info(f"- Opening directory '{path_name}'")
+
+    exists_already = os.path.exists(path)
+    if not exists_already:
+        os.makedirs(path)
+
+    token = _directory.set(path)
+    try:
+        yield exists_already
+    finally:
+        _directory.reset(token)
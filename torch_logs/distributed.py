@@ -0,0 +1,76 @@
+from .imports import *
+
+import torch.distributed as dist
+
+
+def is_distributed() -> bool:
+    return dist.is_available() and dist.is_initialized()
+
+
+def rank() -> int:
+    return dist.get_rank() if is_distributed() else 0
+
+
+def world_size() -> int:
+    return dist.get_world_size() if is_distributed() else 1
+
+
+def is_main_process() -> bool:
+    """Only the main process writes logs, plots and checkpoints."""
+    return rank() == 0
+
+
+def broadcast_object(obj: Any) -> Any:
+    """Share a picklable object of the main process with every rank."""
+    if not is_distributed():
+        return obj
+
+    objects = [obj]
+    dist.broadcast_object_list(objects, src=0)
+    return objects[0]
+
+
+def gather_object(obj: Any) -> Optional[list[Any]]:
+    """Picklable objects of every rank, in order, on the main process; None on the others."""
+    if not is_distributed():
+        return [obj]
+
+    objects = [None] * world_size() if is_main_process() else None
+    dist.gather_object(obj, objects, dst=0)
+    return objects
+
+
+def all_reduce_losses(*losses: Losses) -> tuple[Losses, ...]:
+    """
+    Average dictionaries of losses across ranks.
+
+    Every value is packed into a single tensor so that all of them are reduced
+    in one collective. Every rank must call this with the same keys, in the same order.
+    """
+    if not is_distributed():
+        return losses
+
+    keys = [list(l.keys()) for l in losses]
+    values = [value for l in losses for value in l.values()]
+    if len(values) == 0:
+        return losses
+
+    tensors = [value for value in values if isinstance(value, torch.Tensor)]
+    # * NCCL only reduces device tensors, gloo only host tensors
+    device = (
+        tensors[0].device
+        if len(tensors) > 0
+        else torch.device("cuda" if dist.get_backend() == "nccl" else "cpu")
+    )
+
+    packed = torch.stack(
+        [
+            torch.as_tensor(value, device=device).detach().reshape(()).to(torch.float64)
+            for value in values
+        ]
+    )
+    dist.all_reduce(packed, op=dist.ReduceOp.SUM)
+    packed /= dist.get_world_size()
+
+    reduced = iter(packed)
+    return tuple({key: next(reduced) for key in l} for l in keys)
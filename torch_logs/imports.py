@@ -2,8 +2,7 @@ import os
 import contextlib
 import torch
 import torch.nn as nn
-import pandas as pd
-import plotly.express as px
+import numpy as np
 import shutil
 import enum
 from typing import *  # type: ignore
@@ -12,13 +11,49 @@ import subprocess
 import dataclasses
 from dataclasses import dataclass
 import sys
-from torchvision.utils import save_image
-from torchvision.io import read_image
+import importlib
+import types
 from datetime import datetime
-from torch_loops import * # type: ignore
 import logging 
 import builtins
 
+if TYPE_CHECKING:
+    import pandas as pd
+    import plotly.express as px
+    import plotly.graph_objects as go
+    from torch_loops import TrainingLoop, EvaluationLoop
+
+
+class _LazyModule(types.ModuleType):
+    """
+    Stand-in for a module which is only imported on first attribute access,
+    so that `import torch_logs` does not pay for the plotting stack.
+    """
+
+    def __getattr__(self, name: str) -> Any:
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, name)
+
+
+if not TYPE_CHECKING:
+    pd = _LazyModule("pandas")
+    px = _LazyModule("plotly.express")
+    go = _LazyModule("plotly.graph_objects")
+
+
+def save_image(*args, **kwargs) -> None:
+    from torchvision.utils import save_image
+
+    save_image(*args, **kwargs)
+
+
+# * Mirrors the types of torch_loops, which is not imported so that it does not load pandas
+Preds = TypeVar("Preds")
+Losses = dict[str, torch.Tensor]
+Scores = dict[str, float]
+Model = Callable[[Any], Any]
+
 info = logging.getLogger("torch_loops").info
 warn = logging.getLogger("torch_loops").warn
-error = logging.getLogger("torch_loops").error
\ No newline at end of file
+error = logging.getLogger("torch_loops").error
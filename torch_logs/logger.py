@@ -1,42 +1,38 @@
 from .imports import *
 
+import json
 
-@contextlib.contextmanager
-def directory(path: str) -> Iterable[bool]:
-    relpath = os.path.relpath(os.getcwd() + "/" + path, os.path.dirname(main.__file__))
-    info(f"- Opening directory '{relpath}'")
-
-    exists_already = os.path.exists(path)
-    if not exists_already:
-        os.makedirs(path)
-
-    cwd = os.getcwd()
-    os.chdir(path)
-
-    try:
-        yield exists_already
-    finally:
-        os.chdir(cwd)
+from .checkpoints import CheckpointWriter, save_file
+from .context import current_directory, directory, resolve
+from .memory import MemoryMonitor
+from .metrics import MetricStore, metric_offsets, read_frame, read_metrics
+from .predictions import PredictionArchiveWriter, PredictionExporter
+from .series import MetricCurves
+from .timings import Timings, timed
+from .utils import atomic_path
+from .writer import MetricWriter
 
 
+@timed
 def log_comment(comment: str):
     info(f"- Logging comment")
 
-    latest_comment_path = "../latest/comment.txt"
-    if os.path.exists("../latest/comment.txt"):
+    latest_comment_path = resolve("../latest/comment.txt")
+    if os.path.exists(latest_comment_path):
         with open(latest_comment_path, "r") as f:
             assert (
                 f.read() != comment
             ), "Comment did not change between runs! Write a new comment or delete the old one."
 
-    with open("comment.txt", "w") as f:
+    with open(resolve("comment.txt"), "w") as f:
         f.write(comment)
 
 
+@timed
 def log_architecture(model: Any):
     info(f"- Logging architecture")
 
-    with open("architecture.txt", "w") as file:
+    with open(resolve("architecture.txt"), "w") as file:
         print(str(model), file=file)
         print("--------------------------------", file=file)
         temp = builtins.repr
@@ -45,233 +41,431 @@ def log_architecture(model: Any):
         builtins.repr = temp
 
 
+@timed
 def log_pid() -> None:
     info(f"- Logging PID")
 
-    with open("pid.txt", "w") as f:
+    with open(resolve("pid.txt"), "w") as f:
         f.write(str(os.getpid()))
 
 
-def log_max_memory() -> None:
+@timed
+def log_max_memory(monitor: Optional[MemoryMonitor] = None) -> None:
     info(f"- Logging max memory usage")
 
-    with open("max_memory.txt", "w") as f:
-        f.write(
-            str(torch.cuda.max_memory_allocated())
-        )  # todo generalize to multiple devices
+    if monitor is not None:
+        peaks = monitor.peaks
+    else:
+        peaks = {
+            f"cuda:{device}_peak": torch.cuda.max_memory_allocated(device)
+            for device in range(torch.cuda.device_count())
+        }
+
+    with open(resolve("max_memory.txt"), "w") as f:
+        for key, value in peaks.items():
+            print(f"{key} {int(value)}", file=f)
+
+
+@timed
+def log_memory(
+    monitor: MemoryMonitor, writer: Optional[MetricWriter] = None
+) -> dict[str, float]:
+    info(f"- Logging memory usage")
 
+    sample = monitor.sample()
+    _write_metrics(sample, "memory.metrics", writer=writer)
+    return sample
 
+
+def log_tick(iteration: int, writer: Optional[MetricWriter] = None) -> None:
+    _write_metrics({"iteration": iteration}, "ticks.metrics", writer=writer)
+
+
+def _tick_iterations(iters_per_tick: int) -> Callable[[np.ndarray], np.ndarray]:
+    """
+    Map (possibly fractional) tick indices to iterations, as recorded by `log_tick`,
+    or assuming a tick every `iters_per_tick` iterations for runs which did not record them.
+    """
+    if os.path.exists(resolve("ticks.metrics")):
+        iterations = read_metrics(resolve("ticks.metrics"))["iteration"]
+        if len(iterations) > 0:
+            return lambda positions: np.interp(
+                positions, np.arange(len(iterations)), iterations
+            )
+    return lambda positions: positions * iters_per_tick
+
+
+@timed
 def log_config() -> None:
     info(f"- Logging launch configuration")
 
-    shutil.copy(main.__file__, "config.py")
+    shutil.copy(main.__file__, resolve("config.py"))
 
 
-def log_losses(losses: Losses, validation: bool = False) -> None:
+@timed
+def log_losses(
+    losses: Losses, validation: bool = False, writer: Optional[MetricWriter] = None
+) -> None:
     info(f"- Logging {'validation' if validation else 'training'} losses")
-    _write_losses_to_csv(losses, path = "training_losses.csv" if not validation else "validation_losses.csv")
+    _write_metrics(
+        losses,
+        path="training_losses.metrics" if not validation else "validation_losses.metrics",
+        dtype="<f4",
+        writer=writer,
+    )
+
 
+@timed
+def log_loss_statistics(
+    statistics: Losses, writer: Optional[MetricWriter] = None
+) -> None:
+    info(f"- Logging training loss statistics")
+    _write_metrics(statistics, "training_loss_statistics.metrics", writer=writer)
 
-def log_epoch_losses(losses: Losses, validation: bool = False) -> None:
+
+@timed
+def log_epoch_losses(
+    losses: Losses, validation: bool = False, writer: Optional[MetricWriter] = None
+) -> None:
     info(f"- Logging end of epoch losses")
-    _write_losses_to_csv(losses, "epoch_losses.csv")
+    _write_metrics(losses, "epoch_losses.metrics", dtype="<f4", writer=writer)
 
 
-def _write_losses_to_csv(losses: Losses, path: str):
-    if not os.path.exists(path):
-        with open(path, "w") as file:
-            print(",".join(list(losses.keys())), file=file)
+def _write_metrics(
+    values: Mapping[str, Any],
+    path: str,
+    dtype: str = "<f8",
+    writer: Optional[MetricWriter] = None,
+):
+    if writer is not None:
+        writer.write(path, values, dtype)
+        return
+
+    with MetricStore(resolve(path), values.keys(), dtype) as store:
+        store.append([float(value) for value in values.values()])
+
 
-    with open(path, "a") as file:
-        print(",".join([str(float(value)) for value in losses.values()]), file=file)
+@timed
+def log_metric_offsets(directory: str, names: Optional[Iterable[str]] = None) -> None:
+    info(f"- Logging metric offsets")
 
+    offsets = metric_offsets(resolve(directory))
+    if names is not None:
+        # * Only move the given files forward, keeping the offsets of the others
+        with open(resolve("metrics.json")) as file:
+            offsets = json.load(file) | {
+                name: offsets[name] for name in names if name in offsets
+            }
 
-def log_training(training: Any) -> None:
-    info(f"- Logging training")
+    with atomic_path(resolve("metrics.json")) as temporary:
+        with open(temporary, "w") as file:
+            json.dump(offsets, file, indent=2)
 
-    torch.save(training, "training.pt")
 
+@timed
+def log_state(
+    state: dict[str, Any], checkpoints: Optional[CheckpointWriter] = None
+) -> None:
+    info(f"- Logging training state")
 
-def log_model(model: Model) -> None:
+    _save({"state.pt": state}, checkpoints)
+
+
+@timed
+def log_model(
+    model: Model,
+    checkpoints: Optional[CheckpointWriter] = None,
+    mmap_weights: bool = False,
+) -> None:
     info(f"- Logging model")
-    torch.save(model, "model.pt")
 
+    files = {"model.pt": model}
     if isinstance(model, nn.Module):
-        torch.save(model.state_dict(), "weights.pt")
+        files["weights.pt"] = model.state_dict()
+        if mmap_weights:
+            files["weights.tensors"] = files["weights.pt"]
 
+    _save(files, checkpoints)
 
-def plot_losses(iters_per_tick: int) -> None:
-    info(f"- Plotting losses")
 
-    training_losses = pd.read_csv("training_losses.csv")
-    validation_losses = (
-        pd.read_csv("validation_losses.csv")
-        if os.path.exists("validation_losses.csv")
-        else None
-    )
-    assert (training_losses.columns == validation_losses.columns).all()
+def _save(files: dict[str, Any], checkpoints: Optional[CheckpointWriter] = None):
+    if checkpoints is not None:
+        checkpoints.save(".", files)
+        return
 
-    os.makedirs("plots", exist_ok=True)
+    for name, obj in files.items():
+        save_file(name, obj, resolve(name))
 
-    images = []
 
-    for col in training_losses.columns:
-        if col == "iteration":
-            continue
-        lines = {
-            "training": training_losses[col],
-        }
-        if validation_losses is not None:
-            lines["validation"] = validation_losses[col]
-        df = pd.DataFrame(lines)
-        df.index = pd.RangeIndex(
-            df.index.start, df.index.stop * iters_per_tick, step=iters_per_tick
-        )
-        fig = (
-            px.line(
-                df,
-                title=f"Total weighted objective per iteration"
-                if col == "objective"
-                else f"Average '{col}' loss per iteration",
-                y=list(lines.keys()),
-                log_y=True,
-                template="plotly_dark",
-            )
-            .update_layout(
-                showlegend=validation_losses is not None, xaxis_title="iteration"
-            )
-            .update_traces(line=dict(width=4.0 if col == "objective" else 2.0))
-        )
-        fig.write_image(f"plots/losses_{col}.png")
-        fig.write_html(f"plots/losses_{col}.html")
-        images.append(read_image(f"plots/losses_{col}.png"))
+_loss_curves: dict[str, dict[str, MetricCurves]] = {}
 
-    save_image(torch.stack(images) / 255, "losses_plot.png", padding=0, nrow=1)
 
+def loss_curves() -> dict[str, MetricCurves]:
+    """Loss curves of the current directory, kept across calls so they update incrementally."""
+    return _loss_curves.setdefault(
+        current_directory(),
+        {
+            "training": MetricCurves(resolve("training_losses.metrics")),
+            "validation": MetricCurves(resolve("validation_losses.metrics")),
+        },
+    )
 
-def log_scores(scores: dict[str, float]) -> None:
-    info(f"- Logging scores")
 
-    path = "scores.csv"
+@timed
+def plot_losses(
+    iters_per_tick: int,
+    curves: Optional[dict[str, MetricCurves]] = None,
+    html: bool = True,
+) -> None:
+    info(f"- Plotting losses")
 
-    if not os.path.exists(path):
-        with open(path, "w") as file:
-            print(",".join(list(scores.keys())), file=file)
+    if curves is None:
+        curves = loss_curves()
+    for c in curves.values():
+        c.update()
+
+    has_validation = len(curves["validation"].series) > 0
+    if has_validation:
+        assert curves["training"].series.keys() == curves["validation"].series.keys()
+    to_iterations = _tick_iterations(iters_per_tick)
+
+    columns = [col for col in curves["training"].series.keys() if col != "iteration"]
+    fig = _subplots(
+        [
+            f"Total weighted objective per iteration"
+            if col == "objective"
+            else f"Average '{col}' loss per iteration"
+            for col in columns
+        ]
+    )
 
-    with open(path, "a") as file:
-        print(",".join([str(value) for value in scores.values()]), file=file)
+    for row, col in enumerate(columns, start=1):
+        for (label, c), color in zip(curves.items(), px.colors.qualitative.Plotly):
+            if col not in c.series:
+                continue
+            series = c.series[col]
+            xs = to_iterations(series.positions())
+            fig.add_traces(
+                [
+                    go.Scatter(
+                        x=np.concatenate([xs, xs[::-1]]),
+                        y=np.concatenate([series.maxs, series.mins[::-1]]),
+                        fill="toself",
+                        fillcolor=color,
+                        opacity=0.2,
+                        line=dict(width=0),
+                        hoverinfo="skip",
+                        legendgroup=label,
+                        showlegend=False,
+                    ),
+                    go.Scatter(
+                        x=xs,
+                        y=series.means(),
+                        mode="lines",
+                        name=label,
+                        legendgroup=label,
+                        showlegend=row == 1,
+                        line=dict(color=color, width=4.0 if col == "objective" else 2.0),
+                    ),
+                    go.Scatter(
+                        x=xs,
+                        y=series.expanding_means(),
+                        mode="lines",
+                        name=f"{label} (expanding mean)",
+                        legendgroup=label,
+                        showlegend=row == 1,
+                        line=dict(color=color, width=1.0, dash="dot"),
+                    ),
+                ],
+                rows=row,
+                cols=1,
+            )
 
+    fig.update_layout(showlegend=has_validation).update_xaxes(
+        title_text="iteration"
+    ).update_yaxes(type="log")
+    _write_plot(fig, "losses", html)
 
-def plot_epoch_losses() -> None:
-    info(f"- Plotting end of epoch losses")
 
-    scores = pd.read_csv("epoch_losses.csv")
-    os.makedirs("plots", exist_ok=True)
+@timed
+def plot_memory(iters_per_tick: int, html: bool = True) -> None:
+    info(f"- Plotting memory usage")
 
-    images = []
+    memory = read_frame(resolve("memory.metrics"))
 
-    for col in scores.columns:
-        xs = list(range(1, len(scores[col]) + 1))
-        fig = (
-            px.line(
-                scores[col],
+    xs = _tick_iterations(iters_per_tick)(np.arange(len(memory)))
+    fig = _subplots(["Memory usage per iteration (GiB)"])
+    for col in memory.columns:
+        if col == "time":
+            continue
+        fig.add_trace(
+            go.Scatter(
                 x=xs,
-                y=col,
-                title=f"'{col}' total training losses per epoch",
-                log_y=True,
-                template="plotly_dark",
+                y=memory[col] / 2**30,
+                mode="lines",
+                name=col,
+                line=dict(dash="dot" if col.endswith("_reserved") else "solid"),
             )
-            .update_traces(mode="lines+markers")
-            .update_layout(showlegend=False, xaxis_title="epoch")
-            .update_xaxes(tickmode="array", tickvals=xs)
         )
+    fig.update_xaxes(title_text="iteration").update_yaxes(title_text="GiB")
 
-        fig.write_image(f"plots/epoch_{col}.png")
-        fig.write_html(f"plots/epoch_{col}.html")
+    _write_plot(fig, "memory", html)
 
-        images.append(read_image(f"plots/epoch_{col}.png"))
 
-    save_image(torch.stack(images) / 255, "epoch_plot.png", padding=0, nrow=1)
+@timed
+def log_scores(
+    scores: dict[str, float],
+    writer: Optional[MetricWriter] = None,
+    checkpoint: Optional[int] = None,
+) -> None:
+    info(f"- Logging scores")
+    if checkpoint is not None:
+        scores = {"checkpoint": float(checkpoint)} | scores
+    _write_metrics(scores, "scores.metrics", writer=writer)
 
 
-def plot_scores() -> None:
-    info(f"- Plotting scores")
+@timed
+def plot_epoch_losses(html: bool = True) -> None:
+    info(f"- Plotting end of epoch losses")
 
-    scores = pd.read_csv("scores.csv")
-    os.makedirs("plots", exist_ok=True)
+    _plot_per_checkpoint(
+        read_frame(resolve("epoch_losses.metrics")),
+        "'{}' total training losses per epoch",
+        "epoch",
+        "epoch",
+        html,
+    )
 
-    images = []
 
-    for col in scores.columns:
-        xs = list(range(1, len(scores[col]) + 1))
-        fig = (
-            px.line(
-                scores[col],
-                x=xs,
-                y=col,
-                title=f"'{col}' score per checkpoint",
-                log_y=True,
-                template="plotly_dark",
-            )
-            .update_traces(mode="lines+markers")
-            .update_layout(showlegend=False, xaxis_title="checkpoint")
-            .update_xaxes(tickmode="array", tickvals=xs)
-        )
+@timed
+def plot_scores(html: bool = True) -> None:
+    info(f"- Plotting scores")
 
-        fig.write_image(f"plots/scores_{col}.png")
-        fig.write_html(f"plots/scores_{col}.html")
+    _plot_per_checkpoint(
+        read_frame(resolve("scores.metrics")),
+        "'{}' score per checkpoint",
+        "checkpoint",
+        "scores",
+        html,
+    )
 
-        images.append(read_image(f"plots/scores_{col}.png"))
 
-    save_image(torch.stack(images) / 255, "scores_plot.png", padding=0, nrow=1)
+def _plot_per_checkpoint(
+    frame: "pd.DataFrame", title: str, xaxis_title: str, name: str, html: bool
+) -> None:
+    # * Scores are tagged with their checkpoint, since asynchronous ones may skip some
+    if "checkpoint" in frame.columns:
+        xs = [int(x) for x in frame.pop("checkpoint")]
+    else:
+        xs = list(range(1, len(frame) + 1))
+
+    fig = _subplots([title.format(col) for col in frame.columns])
+    for row, col in enumerate(frame.columns, start=1):
+        fig.add_trace(
+            go.Scatter(x=xs, y=frame[col], mode="lines+markers", name=col),
+            row=row,
+            col=1,
+        )
 
+    fig.update_layout(showlegend=False).update_xaxes(
+        title_text=xaxis_title, tickmode="array", tickvals=xs
+    ).update_yaxes(type="log")
+    _write_plot(fig, name, html)
 
+
+@timed
 def log_predictions(
     j: int,
     preds: Iterable,
     save_prediction: Callable[[Any, str], None],
     suffix: str = "",
+    exporter: Optional[Union[PredictionExporter, PredictionArchiveWriter]] = None,
 ):
-    if j == 0:
+    if j == 0 and suffix == "":
         info(f"- Logging predictions")
 
     if isinstance(preds, dict):
-        for key, value in enumerate(preds.items()):
-            log_predictions(j, value, save_prediction, suffix=suffix + "_" + str(key))
+        for key, value in preds.items():
+            log_predictions(
+                j, value, save_prediction, suffix + "_" + str(key), exporter
+            )
     elif isinstance(preds, list) or isinstance(preds, tuple):
         for i, item in enumerate(preds):
-            log_predictions(j, item, save_prediction, suffix=suffix + "_" + str(i))
+            log_predictions(j, item, save_prediction, suffix + "_" + str(i), exporter)
     elif isinstance(preds, torch.Tensor):
+        if exporter is not None:
+            exporter.export(j, preds, suffix)
+            return
+
         for k, item in enumerate(preds):
             num = f"{j*preds.shape[0]+k:06d}"
-            directory = num[:4]
-            os.makedirs(directory, exist_ok=True)
+            path = resolve(num[:4])
+            os.makedirs(path, exist_ok=True)
             save_prediction(
                 item.unsqueeze(0),
-                f"{directory}/{num}{'_' if suffix != '' else ''}{suffix}.png",
+                f"{path}/{num}{'_' if suffix != '' else ''}{suffix}.png",
             )
     else:
         warn(f"Unable to log prediction: {preds}")
 
 
+_PANEL_WIDTH, _PANEL_HEIGHT = 700, 500
+
+
+def _subplots(titles: list[str]) -> Any:
+    """Figure with one panel per title, stacked vertically at the size of a single plot each."""
+    from plotly.subplots import make_subplots
+
+    return make_subplots(
+        rows=max(len(titles), 1),
+        cols=1,
+        subplot_titles=titles,
+        vertical_spacing=min(0.3 / max(len(titles), 1), 0.1),
+    ).update_layout(
+        template="plotly_dark", width=_PANEL_WIDTH, height=_PANEL_HEIGHT * len(titles)
+    )
+
+
+def _write_plot(fig: Any, name: str, html: bool = True) -> None:
+    """Encode the figure once, into `<name>_plot.png`, and optionally `plots/<name>.html`."""
+    with atomic_path(resolve(f"{name}_plot.png")) as png:
+        fig.write_image(png)
+
+    if html:
+        os.makedirs(resolve("plots"), exist_ok=True)
+        with atomic_path(resolve(f"plots/{name}.html")) as temporary:
+            fig.write_html(temporary)
+
+
+@timed
 def create_symbolic_link(name: str):
     info(f"- Updating (or creating) symbolic link to the latest training")
 
     with directory(".."):
-        if (
-            "latest" in os.listdir()
-        ):  # * os.path.latest does not work when the link is broken!
-            os.remove("latest")
-        os.symlink(name.split("/")[-1], "latest")
+        # * os.path.exists does not work when the link is broken!
+        if "latest" in os.listdir(resolve(".")):
+            os.remove(resolve("latest"))
+        os.symlink(name.split("/")[-1], resolve("latest"))
+
+
+def log_timings(timings: Timings, budget: Optional[float] = None) -> None:
+    info(f"- Logging timings")
+
+    report = timings.write(resolve("timings"))
+    if budget is not None and report["overhead"] > budget:
+        warn(
+            f"Logging overhead is {report['overhead'] * 100:.2f}% of the training time, "
+            f"above the budget of {budget * 100:.2f}%"
+        )
 
 
 @contextlib.contextmanager
 def progress(max_iters: int):
-    path = os.path.abspath("progress.txt")
+    path = resolve("progress.txt")
 
     def log_progress(i: int):
         with open(path, "w") as file:
             print(datetime.now().isoformat(timespec="seconds"), file=file)
-            print(str(round((i / (max_iters - 1)) * 100, 4)) + "%", file=file)
+            print(str(round((i / max(max_iters - 1, 1)) * 100, 4)) + "%", file=file)
 
     yield log_progress
@@ -0,0 +1,59 @@
+from .imports import *
+
+import resource, time
+
+
+class MemoryMonitor:
+    """
+    Samples the memory of every visible CUDA device and the resident set size of the process.
+
+    Each sample reports the peak allocation since the previous sample and then resets it,
+    so a timeline of samples shows spikes which a single run-wide maximum would hide.
+    The run-wide maxima are kept in `peaks`. Reading the allocator statistics never
+    synchronizes the devices.
+    """
+
+    def __init__(self):
+        self.peaks: dict[str, float] = {}
+
+    def devices(self) -> list[int]:
+        # * Every visible device, so that the columns stay the same once CUDA is initialized
+        return (
+            list(range(torch.cuda.device_count())) if torch.cuda.is_available() else []
+        )
+
+    def sample(self) -> dict[str, float]:
+        sample = {"time": time.time(), "rss": float(resident_set_size())}
+
+        for device in self.devices():
+            sample[f"cuda:{device}_allocated"] = float(
+                torch.cuda.memory_allocated(device)
+            )
+            sample[f"cuda:{device}_reserved"] = float(
+                torch.cuda.memory_reserved(device)
+            )
+            sample[f"cuda:{device}_peak"] = float(
+                torch.cuda.max_memory_allocated(device)
+            )
+            if torch.cuda.is_initialized():
+                torch.cuda.reset_peak_memory_stats(device)
+
+        for key, value in sample.items():
+            if key != "time":
+                self.peaks[key] = max(self.peaks.get(key, 0.0), value)
+
+        return sample
+
+    def __reduce__(self):
+        return (type(self), ())
+
+
+def resident_set_size() -> int:
+    """Current resident set size of the process in bytes, or its peak where unavailable."""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # * ru_maxrss is in kilobytes on Linux but in bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
@@ -0,0 +1,171 @@
+from .imports import *
+
+import json, struct
+
+# Layout of a `.metrics` file:
+#   magic (8 bytes) | row count (uint64) | data offset (uint64) | JSON column spec
+#   padded up to `data offset`, followed by the rows as packed fixed-width records.
+# The row count is rewritten in place after every append, so readers only see whole rows.
+
+MAGIC = b"TLMETRC1"
+_PREFIX = struct.Struct("<8sQQ")
+_ALIGNMENT = 64
+
+
+class MetricStore:
+    """
+    Append-only table of fixed-width float columns.
+
+    Rows are packed records, so `read_metrics` can memory-map the file and expose
+    every column as a NumPy view without any parsing.
+    """
+
+    def __init__(
+        self, path: str, columns: Optional[Iterable[str]] = None, dtype: str = "<f8"
+    ):
+        self.path = path
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self.dtype, self.offset, rows = _read_header(path)
+            if columns is not None:
+                assert list(columns) == list(
+                    self.dtype.names
+                ), f"Columns of '{path}' changed from {self.dtype.names} to {list(columns)}"
+            self._file = open(path, "r+b")
+        else:
+            assert (
+                columns is not None
+            ), f"'{path}' does not exist yet; columns are required"
+            self.dtype = np.dtype([(name, dtype) for name in columns])
+            rows = 0
+            self._file = open(path, "w+b")
+            self.offset = _write_header(self._file, self.dtype)
+
+        self.rows = rows
+        # * Drop any partially written row left behind by a crash
+        self._file.truncate(self.offset + self.rows * self.dtype.itemsize)
+        self._file.seek(0, os.SEEK_END)
+
+    @property
+    def columns(self) -> list[str]:
+        return list(self.dtype.names)
+
+    def append(self, *rows: Sequence[float]) -> None:
+        if len(rows) == 0:
+            return
+
+        records = np.array([tuple(row) for row in rows], dtype=self.dtype)
+        self._file.write(records.tobytes())
+        self.rows += len(records)
+
+        self._file.flush()
+        os.pwrite(self._file.fileno(), struct.pack("<Q", self.rows), 8)
+
+    def truncate(self, rows: int) -> None:
+        assert 0 <= rows <= self.rows
+        self.rows = rows
+        self._file.truncate(self.offset + rows * self.dtype.itemsize)
+        self._file.seek(0, os.SEEK_END)
+        os.pwrite(self._file.fileno(), struct.pack("<Q", self.rows), 8)
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __enter__(self) -> "MetricStore":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+
+def read_metrics(path: str) -> np.ndarray:
+    """Memory-map the committed rows of a `.metrics` file as a structured array."""
+    dtype, offset, rows = _read_header(path)
+    rows = min(rows, (os.path.getsize(path) - offset) // dtype.itemsize)
+
+    if rows == 0:
+        return np.empty(0, dtype=dtype)
+
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(rows,))
+
+
+def read_frame(path: str) -> "pd.DataFrame":
+    metrics = read_metrics(path)
+    return pd.DataFrame({name: metrics[name] for name in metrics.dtype.names})
+
+
+def export_csv(path: str, csv_path: Optional[str] = None) -> str:
+    if csv_path is None:
+        csv_path = os.path.splitext(path)[0] + ".csv"
+
+    read_frame(path).to_csv(csv_path, index=False)
+    return csv_path
+
+
+def metric_offsets(directory: str = ".") -> dict[str, dict[str, int]]:
+    """Committed row count and byte length of every `.metrics` file in `directory`."""
+    offsets = {}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".metrics"):
+            dtype, offset, rows = _read_header(os.path.join(directory, name))
+            offsets[name] = {"rows": rows, "bytes": offset + rows * dtype.itemsize}
+    return offsets
+
+
+def truncate_metrics(offsets: dict[str, dict[str, int]], directory: str = ".") -> None:
+    """
+    Roll the `.metrics` files of `directory` back to the `offsets` recorded earlier,
+    removing the files which did not exist yet. Nothing is copied.
+    """
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".metrics"):
+            continue
+
+        path = os.path.join(directory, name)
+        if name not in offsets:
+            os.remove(path)
+            continue
+
+        with MetricStore(path) as store:
+            rows = offsets[name]["rows"]
+            assert rows <= len(store), f"'{path}' has fewer rows than recorded"
+            assert (
+                store.offset + rows * store.dtype.itemsize == offsets[name]["bytes"]
+            ), f"Layout of '{path}' changed since its offsets were recorded"
+            store.truncate(rows)
+
+
+def _write_header(file: BinaryIO, dtype: np.dtype) -> int:
+    spec = json.dumps(
+        {"columns": [[name, dtype[name].str] for name in dtype.names]}
+    ).encode()
+    offset = -(-(_PREFIX.size + len(spec)) // _ALIGNMENT) * _ALIGNMENT
+
+    file.write(_PREFIX.pack(MAGIC, 0, offset))
+    file.write(spec.ljust(offset - _PREFIX.size, b" "))
+    file.flush()
+    return offset
+
+
+def _read_header(path: str) -> tuple[np.dtype, int, int]:
+    with open(path, "rb") as file:
+        magic, rows, offset = _PREFIX.unpack(file.read(_PREFIX.size))
+        assert magic == MAGIC, f"'{path}' is not a metrics file"
+        spec = json.loads(file.read(offset - _PREFIX.size))
+
+    return np.dtype([tuple(column) for column in spec["columns"]]), offset, rows
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export .metrics files to CSV")
+    parser.add_argument("paths", nargs="+")
+    for path in parser.parse_args().paths:
+        print(export_csv(path))
@@ -0,0 +1,116 @@
+from .imports import *
+
+import threading, traceback, atexit
+
+from .context import current_directory, directory
+from .workers import WorkerProcess, worker_channel
+
+
+class PlotScheduler:
+    """
+    Runs plotting functions in a worker process while training continues.
+
+    Requests are keyed by function and working directory: a request which is still
+    waiting when a newer one arrives is replaced, so only the latest state of each
+    plot is rendered. The worker is a fresh interpreter rather than a fork,
+    so it neither inherits CUDA state nor re-runs the training script.
+    """
+
+    def __init__(self):
+        self._pending: dict[tuple[str, str], tuple] = {}
+        self._busy = False
+        self._closing = False
+        self._errors: list[str] = []
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._process = WorkerProcess("torch_logs.plotting")
+
+    def submit(self, function: Callable, *args: Any, **kwargs: Any) -> None:
+        cwd = current_directory()
+        with self._condition:
+            self._start()
+            self._pending[(f"{function.__module__}.{function.__qualname__}", cwd)] = (
+                function,
+                args,
+                kwargs,
+                cwd,
+            )
+            self._condition.notify_all()
+
+    def wait(self) -> None:
+        with self._condition:
+            self._condition.wait_for(lambda: len(self._pending) == 0 and not self._busy)
+            errors, self._errors = self._errors, []
+
+        for e in errors:
+            warn(f"Plotting failed in the worker process:\n{e}")
+
+    def close(self) -> None:
+        atexit.unregister(self.close)
+
+        self.wait()
+
+        with self._condition:
+            self._closing = True
+            self._condition.notify_all()
+            thread, self._thread = self._thread, None
+
+        if thread is not None:
+            thread.join()
+
+        self._closing = False
+
+    def __reduce__(self):
+        return (type(self), ())
+
+    def _start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._dispatch, name="torch_logs.PlotScheduler", daemon=True
+            )
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _dispatch(self) -> None:
+        try:
+            while True:
+                with self._condition:
+                    self._condition.wait_for(lambda: self._pending or self._closing)
+                    if len(self._pending) == 0:
+                        return
+                    job = self._pending.pop(next(iter(self._pending)))
+                    self._busy = True
+
+                try:
+                    error = self._run(job)
+                except Exception:
+                    error = traceback.format_exc()
+                    self._process.stop()
+
+                with self._condition:
+                    if error is not None:
+                        self._errors.append(error)
+                    self._busy = False
+                    self._condition.notify_all()
+        finally:
+            self._process.stop()
+
+    def _run(self, job: tuple) -> Optional[str]:
+        if not self._process.running():
+            self._process.start()
+        self._process.send(job)
+        return self._process.receive()
+
+
+def _worker() -> None:
+    jobs, reply = worker_channel()
+
+    for function, args, kwargs, cwd in jobs:
+        try:
+            with directory(cwd):
+                function(*args, **kwargs)
+            error = None
+        except Exception:
+            error = traceback.format_exc()
+
+        reply(error)
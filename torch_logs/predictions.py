@@ -0,0 +1,278 @@
+from .imports import *
+
+import io, tarfile, tempfile, threading, time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .context import resolve
+
+
+class PredictionExporter:
+    """
+    Saves predictions on a bounded pool of encoder threads.
+
+    Each batch is moved to the CPU once, every `0000/`-style directory is created
+    once, and at most `max_pending` items wait to be encoded at any time.
+    """
+
+    def __init__(
+        self,
+        save_prediction: Callable[[Any, str], None],
+        max_workers: int = 4,
+        max_pending: int = 256,
+    ):
+        self.save_prediction = save_prediction
+        self.count = 0
+
+        self._executor = ThreadPoolExecutor(
+            max_workers, thread_name_prefix="torch_logs.PredictionExporter"
+        )
+        self._slots = threading.Semaphore(max_pending)
+        self._directories: set[str] = set()
+        self._errors: list[BaseException] = []
+        self._start = time.perf_counter()
+
+    def export(self, j: int, preds: torch.Tensor, suffix: str = "") -> None:
+        preds = preds.detach().cpu()
+
+        for k, item in enumerate(preds):
+            num = f"{j*preds.shape[0]+k:06d}"
+            directory = resolve(num[:4])
+            if directory not in self._directories:
+                os.makedirs(directory, exist_ok=True)
+                self._directories.add(directory)
+
+            self._slots.acquire()
+            future = self._executor.submit(
+                self.save_prediction,
+                item.unsqueeze(0),
+                f"{directory}/{num}{'_' if suffix != '' else ''}{suffix}.png",
+            )
+            future.add_done_callback(self._done)
+            self.count += 1
+
+    def close(self) -> float:
+        """Wait for the pending predictions, returning the throughput in items per second."""
+        self._executor.shutdown(wait=True)
+
+        elapsed = time.perf_counter() - self._start
+        throughput = self.count / elapsed if elapsed > 0 else 0.0
+        info(
+            f"- Exported {self.count} predictions in {elapsed:.2f}s ({throughput:.1f}/s)"
+        )
+
+        if len(self._errors) > 0:
+            raise self._errors[0]
+        return throughput
+
+    def __enter__(self) -> "PredictionExporter":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def _done(self, future: Future) -> None:
+        self._slots.release()
+        if future.exception() is not None:
+            self._errors.append(future.exception())  # type: ignore
+
+
+def encode_png(item: torch.Tensor) -> bytes:
+    """Encode an image in [0, 1] as a PNG, as `save_image` would save it."""
+    from torchvision.io import encode_png
+
+    image = item.squeeze(0).mul(255).add_(0.5).clamp_(0, 255).to(torch.uint8)
+    return encode_png(image).numpy().tobytes()
+
+
+def encode_with(
+    save_prediction: Callable[[Any, str], None], item: torch.Tensor
+) -> bytes:
+    """Encode an item as `save_prediction` saves it, through a temporary PNG file."""
+    fd, path = tempfile.mkstemp(suffix=".png")
+    os.close(fd)
+    try:
+        save_prediction(item, path)
+        with open(path, "rb") as file:
+            return file.read()
+    finally:
+        os.remove(path)
+
+
+class PredictionArchiveWriter:
+    """
+    Streams predictions into tar shards of about `shard_bytes` each, instead of one file per item.
+
+    Items are encoded on a pool of threads and appended to the current shard as they
+    complete. `index.tsv` records the shard, offset and size of every item, so that
+    `PredictionArchive` can read any of them back without scanning the shards.
+    """
+
+    def __init__(
+        self,
+        directory: str = ".",
+        shard_bytes: int = 256 << 20,
+        encode: Callable[[torch.Tensor], bytes] = encode_png,
+        extension: str = "png",
+        max_workers: int = 4,
+        max_pending: int = 256,
+    ):
+        self.directory = resolve(directory)
+        self.shard_bytes = shard_bytes
+        self.encode = encode
+        self.extension = extension
+        self.count = 0
+
+        self._executor = ThreadPoolExecutor(
+            max_workers, thread_name_prefix="torch_logs.PredictionArchiveWriter"
+        )
+        self._slots = threading.Semaphore(max_pending)
+        self._lock = threading.Lock()
+        self._errors: list[BaseException] = []
+        self._start = time.perf_counter()
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._index = open(os.path.join(self.directory, "index.tsv"), "w")
+        self._shard = -1
+        self._tar: Optional[tarfile.TarFile] = None
+
+    def export(self, j: int, preds: torch.Tensor, suffix: str = "") -> None:
+        preds = preds.detach().cpu()
+
+        for k, item in enumerate(preds):
+            sample = j * preds.shape[0] + k
+            name = f"{sample:06d}{'_' if suffix != '' else ''}{suffix}.{self.extension}"
+
+            self._slots.acquire()
+            future = self._executor.submit(self._add, sample, suffix, name, item)
+            future.add_done_callback(self._done)
+            self.count += 1
+
+    def close(self) -> float:
+        """Wait for the pending predictions, returning the throughput in items per second."""
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            if self._tar is not None:
+                self._tar.close()
+                self._tar = None
+            self._index.close()
+
+        elapsed = time.perf_counter() - self._start
+        throughput = self.count / elapsed if elapsed > 0 else 0.0
+        info(
+            f"- Archived {self.count} predictions into {self._shard + 1} shard(s) "
+            f"in {elapsed:.2f}s ({throughput:.1f}/s)"
+        )
+
+        if len(self._errors) > 0:
+            raise self._errors[0]
+        return throughput
+
+    def __enter__(self) -> "PredictionArchiveWriter":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def _add(self, sample: int, suffix: str, name: str, item: torch.Tensor) -> None:
+        data = self.encode(item.unsqueeze(0))
+
+        member = tarfile.TarInfo(name)
+        member.size = len(data)
+        member.mtime = int(time.time())
+
+        with self._lock:
+            if self._tar is None or self._tar.offset >= self.shard_bytes:
+                self._next_shard()
+            assert self._tar is not None
+
+            self._tar.addfile(member, io.BytesIO(data))
+            # * The data ends the member, padded to a whole number of blocks
+            offset = (
+                self._tar.offset
+                - -(-len(data) // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+            )
+            print(
+                sample,
+                suffix,
+                self._shard,
+                offset,
+                len(data),
+                name,
+                sep="\t",
+                file=self._index,
+            )
+
+    def _next_shard(self) -> None:
+        if self._tar is not None:
+            self._tar.close()
+        self._shard += 1
+        self._tar = tarfile.open(
+            os.path.join(self.directory, f"shard-{self._shard:05d}.tar"), "w"
+        )
+
+    def _done(self, future: Future) -> None:
+        self._slots.release()
+        if future.exception() is not None:
+            self._errors.append(future.exception())  # type: ignore
+
+
+class PredictionArchive:
+    """Random access to the predictions written by `PredictionArchiveWriter`."""
+
+    def __init__(self, directory: str = "."):
+        self.directory = directory
+        self.entries: dict[tuple[int, str], tuple[int, int, int, str]] = {}
+
+        with open(os.path.join(directory, "index.tsv")) as file:
+            for line in file:
+                sample, suffix, shard, offset, size, name = line.rstrip("\n").split(
+                    "\t"
+                )
+                self.entries[(int(sample), suffix)] = (
+                    int(shard),
+                    int(offset),
+                    int(size),
+                    name,
+                )
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def read(self, sample: int, suffix: str = "") -> bytes:
+        shard, offset, size, _ = self.entries[(sample, suffix)]
+        with open(os.path.join(self.directory, f"shard-{shard:05d}.tar"), "rb") as file:
+            file.seek(offset)
+            return file.read(size)
+
+    def extract(self, output: str) -> int:
+        """Write every prediction to `output/NNNN/` files, as `log_predictions` does without an archive."""
+        by_shard: dict[int, list] = {}
+        for (sample, _), (shard, offset, size, name) in self.entries.items():
+            by_shard.setdefault(shard, []).append((offset, size, sample, name))
+
+        for shard, entries in sorted(by_shard.items()):
+            path = os.path.join(self.directory, f"shard-{shard:05d}.tar")
+            with open(path, "rb") as archive:
+                # * In the order they were written, so each shard is read sequentially
+                for offset, size, sample, name in sorted(entries):
+                    directory = os.path.join(output, f"{sample:06d}"[:4])
+                    os.makedirs(directory, exist_ok=True)
+                    archive.seek(offset)
+                    with open(os.path.join(directory, name), "wb") as file:
+                        file.write(archive.read(size))
+
+        return len(self.entries)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Extract a prediction archive into files"
+    )
+    parser.add_argument("archive")
+    parser.add_argument("output")
+    args = parser.parse_args()
+    print(
+        f"Extracted {PredictionArchive(args.archive).extract(args.output)} predictions"
+    )
@@ -0,0 +1,126 @@
+from .imports import *
+
+import json, time
+
+from torch.profiler import ProfilerActivity, profile
+
+from .context import resolve
+from .utils import atomic_path
+
+
+class StepProfiler:
+    """
+    Profiles a window of training steps with `torch.profiler`.
+
+    Every training step ends with a call to `step`, and `start` arms it for the next
+    `steps` steps. Once the window is over, `stop` ends the profiling and returns
+    what `export_profile` needs to write, possibly from another thread, a Chrome trace,
+    a table of the operators and the overhead of the window into the directory.
+    The overhead compares the profiled steps to a moving average of the others.
+    """
+
+    def __init__(self, smoothing: float = 0.1):
+        self.smoothing = smoothing
+
+        self._profile: Optional[profile] = None
+        self._directory: Optional[str] = None
+        self._remaining = 0
+        self._profiled: list[float] = []
+        self._baseline: Optional[float] = None
+
+    @property
+    def directory(self) -> Optional[str]:
+        """Directory of the window in progress, if any."""
+        return self._directory
+
+    def start(self, directory: str, steps: int) -> None:
+        assert self._profile is None and steps > 0
+
+        activities = [ProfilerActivity.CPU]
+        if torch.cuda.is_available() and torch.cuda.is_initialized():
+            activities.append(ProfilerActivity.CUDA)
+
+        self._directory = resolve(directory)
+        self._remaining = steps
+        self._profiled = []
+
+        self._profile = profile(activities=activities)
+        self._profile.start()
+
+    def step(self, seconds: float) -> bool:
+        """Mark the end of a step which took `seconds`, returning whether the window is over."""
+        if self._profile is None:
+            self._baseline = (
+                seconds
+                if self._baseline is None
+                else self.smoothing * seconds + (1.0 - self.smoothing) * self._baseline
+            )
+            return False
+
+        self._profiled.append(seconds)
+        self._profile.step()
+        self._remaining -= 1
+        return self._remaining == 0
+
+    def stop(self) -> Optional[tuple[profile, str, dict[str, Any]]]:
+        """End the window, if any, returning the profile, its directory and its overhead."""
+        if self._profile is None:
+            return None
+
+        # * Stopping processes the recorded events, so it is part of the overhead
+        start = time.perf_counter()
+        self._profile.stop()
+        stop_seconds = time.perf_counter() - start
+
+        assert self._directory is not None
+        steps = len(self._profiled)
+        step_seconds = sum(self._profiled) / max(steps, 1)
+        baseline = self._baseline
+
+        overhead = {
+            "steps": steps,
+            "step_ms": step_seconds * 1e3,
+            "baseline_step_ms": baseline * 1e3 if baseline is not None else None,
+            "slowdown": (
+                step_seconds / baseline - 1.0
+                if baseline is not None and baseline > 0.0
+                else None
+            ),
+            "extra_s": (
+                max((step_seconds - baseline) * steps, 0.0)
+                if baseline is not None
+                else 0.0
+            ),
+            "stop_s": stop_seconds,
+        }
+
+        result = (self._profile, self._directory, overhead)
+        self._profile, self._directory = None, None
+        return result
+
+    def __reduce__(self):
+        # * Profiles cannot be pickled
+        return (type(self), (self.smoothing,))
+
+
+def export_profile(profile: profile, directory: str, overhead: dict[str, Any]) -> None:
+    """Write `trace.json`, `operators.txt` and `overhead.json` into the directory."""
+    os.makedirs(directory, exist_ok=True)
+    start = time.perf_counter()
+
+    with atomic_path(os.path.join(directory, "trace.json")) as temporary:
+        profile.export_chrome_trace(temporary)
+
+    cuda = ProfilerActivity.CUDA in profile.activities
+    table = profile.key_averages().table(
+        sort_by="self_cuda_time_total" if cuda else "self_cpu_time_total",
+        row_limit=50,
+    )
+    with atomic_path(os.path.join(directory, "operators.txt")) as temporary:
+        with open(temporary, "w") as file:
+            file.write(table)
+
+    overhead = overhead | {"export_s": time.perf_counter() - start}
+    with atomic_path(os.path.join(directory, "overhead.json")) as temporary:
+        with open(temporary, "w") as file:
+            json.dump(overhead, file, indent=2)
@@ -0,0 +1,253 @@
+from .imports import *
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from .metrics import read_metrics
+from .utils import atomic_path
+
+# * Files whose modification times decide whether a cached summary is still valid
+SUMMARY_FILES = (
+    "training_losses.metrics",
+    "validation_losses.metrics",
+    "scores.metrics",
+    "progress.txt",
+    "comment.txt",
+    "pid.txt",
+    "checkpoints/index.json",
+)
+_SKIPPED = {"checkpoints", "predictions", "plots"}
+
+
+class RunIndex:
+    """
+    Summaries of every run under an experiments root.
+
+    Runs are found and summarized by a pool of threads. Summaries are cached in
+    `<root>/.run_index.json`, keyed by the modification times of the files they
+    are read from, so only the runs which changed since the last query are read again.
+    """
+
+    def __init__(self, root: str, workers: int = 16):
+        self.root = os.path.abspath(root)
+        self.workers = workers
+        self.cache_path = os.path.join(self.root, ".run_index.json")
+
+    def runs(self) -> list[str]:
+        """Directories of the runs under the root, relative to it."""
+        runs = []
+
+        def visit(directory: str) -> None:
+            with os.scandir(directory) as iterator:
+                entries = list(iterator)
+
+            names = {entry.name for entry in entries}
+            if "training_losses.metrics" in names or "pid.txt" in names:
+                runs.append(os.path.relpath(directory, self.root))
+                return
+
+            for entry in entries:
+                # * Symbolic links such as `latest` point to runs which are already listed
+                if (
+                    entry.is_dir(follow_symlinks=False)
+                    and entry.name not in _SKIPPED
+                    and not entry.name.startswith(".")
+                ):
+                    visit(entry.path)
+
+        visit(self.root)
+        return sorted(runs)
+
+    def summaries(self) -> list[dict[str, Any]]:
+        cache = self._load_cache()
+        runs = self.runs()
+
+        def summarize(run: str) -> tuple[str, dict]:
+            path = os.path.join(self.root, run)
+            mtimes = _mtimes(path)
+            cached = cache.get(run)
+            if cached is not None and cached["mtimes"] == mtimes:
+                summary = cached["summary"]
+            else:
+                summary = summarize_run(path)
+            # * Whether the process is still alive is checked on every query
+            summary["status"] = _status(path, summary)
+            return run, {"mtimes": mtimes, "summary": summary}
+
+        with ThreadPoolExecutor(self.workers) as executor:
+            entries = dict(executor.map(summarize, runs))
+
+        if entries != cache:
+            self._store_cache(entries)
+
+        return [{"run": run} | entry["summary"] for run, entry in entries.items()]
+
+    def frame(self) -> "pd.DataFrame":
+        """One row per run, with nested summaries flattened into `a.b.c` columns."""
+        return pd.DataFrame([_flatten(summary) for summary in self.summaries()])
+
+    def plot(self, column: str, path: str = "runs", top: Optional[int] = None) -> Any:
+        """Compare runs by `column`, writing `<path>.html` and `<path>.png`."""
+        frame = self.frame()
+        assert column in frame.columns, f"No column '{column}' in the run index"
+
+        frame = frame.dropna(subset=[column]).sort_values(column)
+        if top is not None:
+            frame = frame.head(top)
+
+        fig = go.Figure(
+            go.Bar(
+                x=frame[column],
+                y=frame["run"],
+                orientation="h",
+                hovertext=frame.get("comment"),
+            )
+        ).update_layout(
+            title=f"'{column}' per run",
+            template="plotly_dark",
+            xaxis_title=column,
+            height=max(400, 20 * len(frame)),
+            yaxis=dict(autorange="reversed"),
+        )
+
+        with atomic_path(f"{path}.html") as html:
+            fig.write_html(html)
+        with atomic_path(f"{path}.png") as png:
+            fig.write_image(png)
+        return fig
+
+    def _load_cache(self) -> dict[str, Any]:
+        try:
+            with open(self.cache_path) as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _store_cache(self, entries: dict[str, Any]) -> None:
+        try:
+            with atomic_path(self.cache_path) as temporary:
+                with open(temporary, "w") as file:
+                    json.dump(entries, file)
+        except OSError as e:
+            warn(f"Unable to cache the run index: {e}")
+
+
+def summarize_run(path: str) -> dict[str, Any]:
+    """Comment, progress, final and best losses, scores and checkpoints of a run."""
+    summary: dict[str, Any] = {"comment": None, "progress": None, "pid": None}
+
+    if os.path.exists(f"{path}/comment.txt"):
+        with open(f"{path}/comment.txt") as file:
+            summary["comment"] = file.read().strip()
+
+    if os.path.exists(f"{path}/progress.txt"):
+        with open(f"{path}/progress.txt") as file:
+            lines = file.read().split()
+        if len(lines) >= 2:
+            summary["updated"] = lines[0]
+            summary["progress"] = float(lines[1].rstrip("%"))
+
+    if os.path.exists(f"{path}/pid.txt"):
+        with open(f"{path}/pid.txt") as file:
+            summary["pid"] = int(file.read().strip() or 0) or None
+
+    for name, best in [
+        ("training_losses", np.min),
+        ("validation_losses", np.min),
+        ("scores", None),
+    ]:
+        if not os.path.exists(f"{path}/{name}.metrics"):
+            continue
+        metrics = read_metrics(f"{path}/{name}.metrics")
+        summary[f"{name}_rows"] = len(metrics)
+        if len(metrics) == 0:
+            continue
+        summary[name] = {
+            column: {"final": float(metrics[column][-1])}
+            | (
+                {"best": float(best(metrics[column]))}
+                if best is not None
+                else {
+                    "min": float(np.min(metrics[column])),
+                    "max": float(np.max(metrics[column])),
+                }
+            )
+            for column in metrics.dtype.names
+        }
+
+    if os.path.exists(f"{path}/checkpoints/index.json"):
+        with open(f"{path}/checkpoints/index.json") as file:
+            checkpoints = [
+                entry
+                for entry in json.load(file)["checkpoints"]
+                if entry.get("complete", True)
+            ]
+        summary["checkpoints"] = len(checkpoints)
+        if len(checkpoints) > 0:
+            summary["iteration"] = checkpoints[-1].get("iteration")
+
+    return summary
+
+
+def _status(path: str, summary: dict[str, Any]) -> str:
+    if summary.get("progress") is not None and summary["progress"] >= 100.0:
+        return "finished"
+
+    pid = summary.get("pid")
+    if pid is not None:
+        try:
+            os.kill(pid, 0)
+            return "running"
+        except ProcessLookupError:
+            pass
+        except PermissionError:
+            return "running"
+
+    return "stopped"
+
+
+def _mtimes(path: str) -> dict[str, int]:
+    mtimes = {}
+    for name in SUMMARY_FILES:
+        try:
+            mtimes[name] = os.stat(os.path.join(path, name)).st_mtime_ns
+        except FileNotFoundError:
+            pass
+    return mtimes
+
+
+def _flatten(summary: dict[str, Any], prefix: str = "") -> dict[str, Any]:
+    flat = {}
+    for key, value in summary.items():
+        if isinstance(value, dict):
+            flat |= _flatten(value, f"{prefix}{key}.")
+        else:
+            flat[prefix + key] = value
+    return flat
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize the runs under a directory")
+    parser.add_argument("root")
+    parser.add_argument("--sort", help="column to sort the runs by")
+    parser.add_argument("--columns", nargs="+", help="columns to show")
+    parser.add_argument("--csv", help="also write the summaries to this file")
+    parser.add_argument("--plot", help="column to compare the runs by in runs.png")
+    parser.add_argument("--workers", type=int, default=16)
+    args = parser.parse_args()
+
+    index = RunIndex(args.root, args.workers)
+    frame = index.frame()
+    if args.sort is not None:
+        frame = frame.sort_values(args.sort)
+    if args.csv is not None:
+        frame.to_csv(args.csv, index=False)
+    if args.plot is not None:
+        index.plot(args.plot)
+
+    if args.columns is not None:
+        frame = frame[["run", *args.columns]]
+    with pd.option_context("display.max_rows", None, "display.width", None):
+        print(frame.to_string(index=False))
@@ -0,0 +1,178 @@
+from .imports import *
+
+import math, time
+
+
+class Schedule:
+    """
+    Decides at which iterations a logging event is triggered.
+
+    `due` is asked before the event of each iteration, and `triggered` is told how
+    long the event took once it was handled. Schedules which are `deterministic`
+    only depend on the iteration, so that every rank of a distributed training
+    agrees on them without communicating; the decisions of the others are made
+    by the main process and broadcast to every rank, once per iteration.
+    """
+
+    deterministic = False
+
+    def due(self, iteration: int) -> bool:
+        raise NotImplementedError
+
+    def triggered(self, iteration: int, cost: float) -> None:
+        pass
+
+
+class EveryIterations(Schedule):
+    """Every `iterations` iterations, starting with the first."""
+
+    deterministic = True
+
+    def __init__(self, iterations: int):
+        assert iterations >= 1
+        self.iterations = iterations
+
+    def due(self, iteration: int) -> bool:
+        return iteration % self.iterations == 0
+
+    def __repr__(self) -> str:
+        return f"EveryIterations({self.iterations})"
+
+
+class EveryInterval(Schedule):
+    """On the first iteration, then at least `seconds` of wall time after the previous event."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self._last: Optional[float] = None
+
+    def due(self, iteration: int) -> bool:
+        return self._last is None or time.monotonic() - self._last >= self.seconds
+
+    def triggered(self, iteration: int, cost: float) -> None:
+        self._last = time.monotonic()
+
+    def __repr__(self) -> str:
+        return f"EveryInterval({self.seconds})"
+
+    def __reduce__(self):
+        # * A resumed training starts its intervals over
+        return (type(self), (self.seconds,))
+
+
+class WithinBudget(Schedule):
+    """
+    As often as possible while the event takes at most a `budget` fraction of the wall time.
+
+    The wait after each event is scaled from a moving average of its cost, so that
+    cost / (cost + wait) stays at the budget, and clamped to `[min_seconds, max_seconds]`.
+    """
+
+    def __init__(
+        self,
+        budget: float,
+        min_seconds: float = 0.0,
+        max_seconds: float = math.inf,
+        smoothing: float = 0.5,
+    ):
+        assert 0.0 < budget < 1.0
+        self.budget = budget
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+        self.smoothing = smoothing
+
+        self._cost: Optional[float] = None
+        self._last: Optional[float] = None
+
+    def wait(self) -> float:
+        """Seconds to wait after the previous event."""
+        if self._cost is None:
+            return self.min_seconds
+
+        wait = self._cost * (1.0 - self.budget) / self.budget
+        return min(max(wait, self.min_seconds), self.max_seconds)
+
+    def due(self, iteration: int) -> bool:
+        return self._last is None or time.monotonic() - self._last >= self.wait()
+
+    def triggered(self, iteration: int, cost: float) -> None:
+        self._cost = (
+            cost
+            if self._cost is None
+            else self.smoothing * cost + (1.0 - self.smoothing) * self._cost
+        )
+        self._last = time.monotonic()
+
+    def __repr__(self) -> str:
+        return f"WithinBudget({self.budget}, {self.min_seconds}, {self.max_seconds})"
+
+    def __reduce__(self):
+        return (
+            type(self),
+            (self.budget, self.min_seconds, self.max_seconds, self.smoothing),
+        )
+
+
+class Once(Schedule):
+    """At the first iteration from `after` on, e.g. once the warmup is over."""
+
+    deterministic = True
+
+    def __init__(self, after: int = 0):
+        self.after = after
+        self._done = False
+
+    def due(self, iteration: int) -> bool:
+        return not self._done and iteration >= self.after
+
+    def triggered(self, iteration: int, cost: float) -> None:
+        self._done = True
+
+    def __repr__(self) -> str:
+        return f"Once({self.after})"
+
+
+class AnyOf(Schedule):
+    """
+    Whenever any of the schedules is due, e.g. `AnyOf(EveryIterations(1000), EveryInterval(600))`
+    to checkpoint every 1000 iterations, but at least every 10 minutes.
+    Every schedule is told when the event is triggered, whichever was due.
+    """
+
+    def __init__(self, *schedules: Schedule):
+        assert len(schedules) > 0
+        self.schedules = schedules
+        self.deterministic = all(s.deterministic for s in schedules)  # type: ignore
+
+    def due(self, iteration: int) -> bool:
+        return any([s.due(iteration) for s in self.schedules])
+
+    def triggered(self, iteration: int, cost: float) -> None:
+        for s in self.schedules:
+            s.triggered(iteration, cost)
+
+    def __repr__(self) -> str:
+        return f"AnyOf({', '.join(map(repr, self.schedules))})"
+
+
+class AllOf(Schedule):
+    """
+    Whenever all of the schedules are due, e.g. `AllOf(EveryIterations(100), WithinBudget(0.01))`
+    to log every 100 iterations at most, as long as logging takes at most 1% of the time.
+    Every schedule is told when the event is triggered.
+    """
+
+    def __init__(self, *schedules: Schedule):
+        assert len(schedules) > 0
+        self.schedules = schedules
+        self.deterministic = all(s.deterministic for s in schedules)  # type: ignore
+
+    def due(self, iteration: int) -> bool:
+        return all([s.due(iteration) for s in self.schedules])
+
+    def triggered(self, iteration: int, cost: float) -> None:
+        for s in self.schedules:
+            s.triggered(iteration, cost)
+
+    def __repr__(self) -> str:
+        return f"AllOf({', '.join(map(repr, self.schedules))})"
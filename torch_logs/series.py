@@ -0,0 +1,129 @@
+from .imports import *
+
+from .metrics import read_metrics
+
+
+class DownsampledSeries:
+    """
+    Min/max/mean summary of a stream of values, kept in at most `max_buckets` buckets.
+
+    Buckets hold `width` consecutive values (only the last one may be partial).
+    When they overflow, adjacent pairs are merged and the width doubles, so the
+    point count stays bounded however long the run is. Bucket means are windowed
+    means over non-overlapping windows, so unlike a rolling window no leading
+    values are lost; `expanding_means` gives the mean of everything seen so far.
+    """
+
+    def __init__(self, max_buckets: int = 1024):
+        assert max_buckets >= 2
+        self.max_buckets = max_buckets
+        self.width = 1
+        self.mins = np.empty(0)
+        self.maxs = np.empty(0)
+        self.sums = np.empty(0)
+        self.counts = np.empty(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return int(self.counts.sum())
+
+    def extend(self, values: Any) -> None:
+        values = np.asarray(values, dtype=np.float64).reshape(-1)
+        if len(values) == 0:
+            return
+
+        while self._buckets_after(len(values)) > self.max_buckets:
+            self._merge()
+
+        if len(self.counts) > 0 and self.counts[-1] < self.width:
+            head = values[: self.width - self.counts[-1]]
+            values = values[len(head) :]
+            self.mins[-1] = min(self.mins[-1], head.min())
+            self.maxs[-1] = max(self.maxs[-1], head.max())
+            self.sums[-1] += head.sum()
+            self.counts[-1] += len(head)
+
+        full = len(values) // self.width * self.width
+        blocks = values[:full].reshape(-1, self.width)
+        self._append(
+            blocks.min(1),
+            blocks.max(1),
+            blocks.sum(1),
+            np.full(len(blocks), self.width),
+        )
+
+        if full < len(values):
+            tail = values[full:]
+            self._append([tail.min()], [tail.max()], [tail.sum()], [len(tail)])
+
+    def means(self) -> np.ndarray:
+        return self.sums / self.counts
+
+    def expanding_means(self) -> np.ndarray:
+        return np.cumsum(self.sums) / np.cumsum(self.counts)
+
+    def positions(self) -> np.ndarray:
+        """Index of the center of each bucket in the original stream."""
+        starts = np.cumsum(self.counts) - self.counts
+        return starts + (self.counts - 1) / 2
+
+    def _append(self, mins, maxs, sums, counts) -> None:
+        self.mins = np.concatenate([self.mins, mins])
+        self.maxs = np.concatenate([self.maxs, maxs])
+        self.sums = np.concatenate([self.sums, sums])
+        self.counts = np.concatenate([self.counts, counts])
+
+    def _buckets_after(self, num_values: int) -> int:
+        full = len(self.counts)
+        pending = num_values
+        if full > 0 and self.counts[-1] < self.width:
+            full -= 1
+            pending += self.counts[-1]
+        return full + -(-pending // self.width)
+
+    def _merge(self) -> None:
+        n = len(self.counts)
+        pairs = n // 2 * 2
+
+        def reduce(values: np.ndarray, op: Callable) -> np.ndarray:
+            merged = op(values[:pairs].reshape(-1, 2), axis=1)
+            return np.concatenate([merged, values[pairs:]])
+
+        self.mins = reduce(self.mins, np.min)
+        self.maxs = reduce(self.maxs, np.max)
+        self.sums = reduce(self.sums, np.sum)
+        self.counts = reduce(self.counts, np.sum)
+        self.width *= 2
+
+
+class MetricCurves:
+    """
+    Downsampled series for every column of a `.metrics` file.
+    Each `update` only ingests the rows appended since the previous one.
+    """
+
+    def __init__(self, path: str, max_buckets: int = 1024):
+        self.path = path
+        self.max_buckets = max_buckets
+        self.reset()
+
+    def reset(self) -> None:
+        self.rows = 0
+        self.series: dict[str, DownsampledSeries] = {}
+
+    def update(self) -> "MetricCurves":
+        if not os.path.exists(self.path):
+            self.reset()
+            return self
+
+        metrics = read_metrics(self.path)
+        if len(metrics) < self.rows:  # * The file was rolled back
+            self.reset()
+
+        new_rows = metrics[self.rows :]
+        for name in metrics.dtype.names:
+            if name not in self.series:
+                self.series[name] = DownsampledSeries(self.max_buckets)
+            self.series[name].extend(new_rows[name])
+
+        self.rows = len(metrics)
+        return self
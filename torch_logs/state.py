@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+from .imports import *
+
+import itertools, random
+
+from torch.utils.data import DataLoader
+
+from .weights import load_weights
+
+
+def rng_state() -> dict[str, Any]:
+    return {
+        "torch": torch.get_rng_state(),
+        # * Only read when CUDA is in use already, since reading it would initialize it
+        "cuda": (
+            torch.cuda.get_rng_state_all()
+            if torch.cuda.is_available() and torch.cuda.is_initialized()
+            else None
+        ),
+        "numpy": np.random.get_state(),
+        "python": random.getstate(),
+    }
+
+
+def set_rng_state(state: dict[str, Any]) -> None:
+    torch.set_rng_state(state["torch"])
+    if state["cuda"] is not None and torch.cuda.is_available():
+        if len(state["cuda"]) == torch.cuda.device_count():
+            torch.cuda.set_rng_state_all(state["cuda"])
+        else:
+            warn("The number of CUDA devices changed - not restoring their RNG states")
+    np.random.set_state(state["numpy"])
+    random.setstate(state["python"])
+
+
+def loader_generators(dataloader: Any) -> list[torch.Generator]:
+    """The generators which a `DataLoader` and its samplers draw the order of an epoch from."""
+    sampler = getattr(dataloader, "sampler", None)
+    batch_sampler = getattr(dataloader, "batch_sampler", None)
+    candidates = [
+        getattr(dataloader, "generator", None),
+        getattr(sampler, "generator", None),
+        getattr(getattr(batch_sampler, "sampler", None), "generator", None),
+    ]
+
+    generators: dict[int, torch.Generator] = {}
+    for generator in candidates:
+        if isinstance(generator, torch.Generator):
+            generators.setdefault(id(generator), generator)
+    return list(generators.values())
+
+
+def generator_states(dataloader: Any) -> list[torch.Tensor]:
+    return [generator.get_state() for generator in loader_generators(dataloader)]
+
+
+def set_generator_states(dataloader: Any, states: list[torch.Tensor]) -> None:
+    generators = loader_generators(dataloader)
+    if len(generators) != len(states):
+        warn("The generators of the dataloader changed - not restoring their states")
+        return
+    for generator, state in zip(generators, states):
+        generator.set_state(state)
+
+
+@contextlib.contextmanager
+def fork_rng() -> Iterator[None]:
+    """
+    Restore the RNG states after the block, so that what it draws, e.g. tick evaluations
+    or validation reseeding the RNGs, does not change those of the training.
+    """
+    devices = (
+        list(range(torch.cuda.device_count()))
+        if torch.cuda.is_available() and torch.cuda.is_initialized()
+        else []
+    )
+    with torch.random.fork_rng(devices):
+        yield
+
+
+def unwrap_model(model: Model) -> Model:
+    """The module wrapped by `DistributedDataParallel` or `DataParallel`, if any."""
+    if isinstance(model, (nn.parallel.DistributedDataParallel, nn.DataParallel)):
+        return model.module
+    return model
+
+
+def loop_state(loop: TrainingLoop) -> dict[str, Any]:
+    """States of the optimizers, schedulers and gradient scaler of a training loop."""
+    scaler = getattr(loop, "_scaler", None)
+    return {
+        "optimizers": [optimizer.state_dict() for optimizer in loop.optimizers],
+        "schedulers": [scheduler.state_dict() for scheduler in loop.schedulers],
+        "scaler": scaler.state_dict() if scaler is not None else None,
+    }
+
+
+def load_loop_state(loop: TrainingLoop, state: dict[str, Any]) -> None:
+    optimizers, schedulers = list(loop.optimizers), list(loop.schedulers)
+    assert len(optimizers) == len(state["optimizers"]), "The optimizers changed"
+    assert len(schedulers) == len(state["schedulers"]), "The schedulers changed"
+
+    for optimizer, optimizer_state in zip(optimizers, state["optimizers"]):
+        optimizer.load_state_dict(optimizer_state)
+    for scheduler, scheduler_state in zip(schedulers, state["schedulers"]):
+        scheduler.load_state_dict(scheduler_state)
+
+    scaler = getattr(loop, "_scaler", None)
+    if scaler is not None and state["scaler"] is not None:
+        scaler.load_state_dict(state["scaler"])
+
+
+def load_model_weights(model: Model, directory: str) -> None:
+    """Load the weights saved by `logger.log_model` into `directory`."""
+    path = os.path.join(directory, "weights.tensors")
+    weights = (
+        load_weights(path, lazy=True)
+        if os.path.exists(path)
+        else torch.load(os.path.join(directory, "weights.pt"), map_location="cpu")
+    )
+    unwrap_model(model).load_state_dict(weights)
+
+
+class SkippedBatches:
+    """
+    A dataloader whose first `skip` batches are skipped, calling `on_start` once
+    the first remaining batch is loaded, e.g. to restore the RNG states of a checkpoint.
+
+    For a `DataLoader` over a map-style dataset, only the indices of the skipped
+    batches are drawn from its batch sampler, so their samples are never loaded and
+    the order of the remaining ones is unchanged. Other iterables have their skipped
+    batches loaded and dropped. Its length is that of the whole dataloader.
+    The order of the batches is only the one of the interrupted epoch if the loader
+    draws it from the same states, which `Training` restores for the RNGs and for
+    the generators of a `DataLoader` and its sampler.
+    """
+
+    def __init__(
+        self,
+        dataloader: Iterable,
+        skip: int,
+        on_start: Optional[Callable[[], None]] = None,
+    ):
+        self.dataloader = dataloader
+        self.skip = skip
+        self.on_start = on_start
+
+    def __iter__(self) -> Iterator:
+        loader = self.dataloader
+        if (
+            isinstance(loader, DataLoader)
+            and loader.batch_sampler is not None
+            and not isinstance(loader.dataset, torch.utils.data.IterableDataset)
+        ):
+            iterator = iter(_with_batch_sampler(loader, self.skip))
+        else:
+            iterator = itertools.islice(iter(loader), self.skip, None)
+
+        # * Loaders draw their seeds when they start, which must not see the restored states
+        first = next(iterator, _DONE)
+        if self.on_start is not None:
+            self.on_start()
+        if first is _DONE:
+            return
+
+        yield first
+        yield from iterator
+
+    def __len__(self) -> int:
+        return len(self.dataloader)  # type: ignore
+
+
+class _SkippedBatchSampler:
+    def __init__(self, batch_sampler: Iterable[list[int]], skip: int):
+        self.batch_sampler = batch_sampler
+        self.skip = skip
+
+    def __iter__(self) -> Iterator[list[int]]:
+        return itertools.islice(iter(self.batch_sampler), self.skip, None)
+
+    def __len__(self) -> int:
+        return max(len(self.batch_sampler) - self.skip, 0)  # type: ignore
+
+
+def _with_batch_sampler(loader: DataLoader, skip: int) -> DataLoader:
+    """A copy of the loader which skips the first `skip` batches of its batch sampler."""
+    options = dict(
+        batch_sampler=_SkippedBatchSampler(loader.batch_sampler, skip),
+        num_workers=loader.num_workers,
+        collate_fn=loader.collate_fn,
+        pin_memory=loader.pin_memory,
+        timeout=loader.timeout,
+        worker_init_fn=loader.worker_init_fn,
+        multiprocessing_context=loader.multiprocessing_context,
+        generator=loader.generator,
+        persistent_workers=loader.persistent_workers,
+        pin_memory_device=loader.pin_memory_device,
+    )
+    if loader.num_workers > 0:
+        options["prefetch_factor"] = loader.prefetch_factor
+    return DataLoader(loader.dataset, **options)  # type: ignore
+
+
+_DONE = object()
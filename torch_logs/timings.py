@@ -0,0 +1,228 @@
+from .imports import *
+
+import contextvars, functools, json, math, time
+
+from .utils import atomic_path
+
+
+class Histogram:
+    """Counts of durations in power-of-two buckets of microseconds."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self.buckets: dict[int, int] = {}
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.last = seconds
+        bucket = max(0, math.frexp(seconds * 1e6)[1])
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound, in seconds, of the bucket holding the `q` quantile."""
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= q * self.count:
+                return min(2.0**bucket / 1e6, self.max)
+        return self.max
+
+    def summary(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "total_s": self.total,
+            "mean_ms": self.total / max(self.count, 1) * 1e3,
+            "p50_ms": self.quantile(0.5) * 1e3,
+            "p90_ms": self.quantile(0.9) * 1e3,
+            "p99_ms": self.quantile(0.99) * 1e3,
+            "max_ms": self.max * 1e3,
+        }
+
+
+class Timings:
+    """
+    Wall time and, when CUDA is in use, GPU time of the phases of a training.
+
+    GPU times are measured with events which are only read back when a report
+    is made, so measuring never synchronizes the device on the hot path.
+    Phases marked as `overhead` make up the logging overhead of the report.
+    """
+
+    def __init__(self):
+        self.wall: dict[str, Histogram] = {}
+        self.cuda: dict[str, Histogram] = {}
+        self.overhead_phases: set[str] = set()
+        self.start_time = time.perf_counter()
+
+        self._started: dict[str, tuple[float, Optional[Any]]] = {}
+        self._events: list[tuple[str, Any, Any]] = []
+
+    def start(self, phase: str) -> None:
+        event = None
+        if torch.cuda.is_available() and torch.cuda.is_initialized():
+            event = torch.cuda.Event(enable_timing=True)
+            event.record()
+        self._started[phase] = (time.perf_counter(), event)
+
+    def stop(self, phase: str) -> None:
+        if phase not in self._started:
+            return
+
+        start, start_event = self._started.pop(phase)
+        self.add(phase, time.perf_counter() - start)
+
+        if start_event is not None:
+            end_event = torch.cuda.Event(enable_timing=True)
+            end_event.record()
+            self._events.append((phase, start_event, end_event))
+
+    def add(self, phase: str, seconds: float, overhead: bool = False) -> None:
+        """Record a duration measured otherwise, e.g. the slowdown caused by profiling."""
+        if overhead:
+            self.overhead_phases.add(phase)
+        self.wall.setdefault(phase, Histogram()).add(seconds)
+
+    @contextlib.contextmanager
+    def measure(self, phase: str, overhead: bool = False) -> Iterator[None]:
+        if overhead:
+            self.overhead_phases.add(phase)
+
+        self.start(phase)
+        try:
+            yield
+        finally:
+            self.stop(phase)
+
+    def is_running(self, phase: str) -> bool:
+        return phase in self._started
+
+    @contextlib.contextmanager
+    def activate(self) -> Iterator[None]:
+        """Also time the logger functions called within the block."""
+        if len(self.wall) == 0:
+            self.start_time = time.perf_counter()
+
+        token = _active.set(self)
+        try:
+            yield
+        finally:
+            _active.reset(token)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start_time
+
+    def overhead(self) -> float:
+        """Fraction of the elapsed time spent in overhead phases."""
+        total = sum(self.wall[p].total for p in self.overhead_phases if p in self.wall)
+        return total / max(self.elapsed(), 1e-9)
+
+    def report(self) -> dict[str, Any]:
+        for phase, start_event, end_event in self._events:
+            end_event.synchronize()
+            self.cuda.setdefault(phase, Histogram()).add(
+                start_event.elapsed_time(end_event) / 1e3
+            )
+        self._events.clear()
+
+        return {
+            "elapsed_s": self.elapsed(),
+            "overhead": self.overhead(),
+            "phases": {
+                phase: histogram.summary()
+                | {"share": histogram.total / max(self.elapsed(), 1e-9)}
+                | (
+                    {"cuda_total_s": self.cuda[phase].total}
+                    if phase in self.cuda
+                    else {}
+                )
+                for phase, histogram in sorted(self.wall.items())
+            },
+        }
+
+    def write(self, path: str = "timings") -> dict[str, Any]:
+        report = self.report()
+
+        with atomic_path(f"{path}.json") as temporary:
+            with open(temporary, "w") as file:
+                json.dump(report, file, indent=2)
+
+        with atomic_path(f"{path}.txt") as temporary:
+            with open(temporary, "w") as file:
+                print(
+                    f"elapsed {report['elapsed_s']:.1f}s, "
+                    f"logging overhead {report['overhead'] * 100:.2f}%",
+                    file=file,
+                )
+                print(
+                    f"{'phase':<32}{'count':>8}{'total s':>10}{'share':>8}"
+                    f"{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'cuda s':>10}",
+                    file=file,
+                )
+                for phase, s in report["phases"].items():
+                    print(
+                        f"{phase:<32}{s['count']:>8}{s['total_s']:>10.3f}"
+                        f"{s['share'] * 100:>7.2f}%{s['mean_ms']:>10.2f}"
+                        f"{s['p50_ms']:>10.2f}{s['p99_ms']:>10.2f}{s['max_ms']:>10.2f}"
+                        + (
+                            f"{s['cuda_total_s']:>10.3f}"
+                            if "cuda_total_s" in s
+                            else f"{'-':>10}"
+                        ),
+                        file=file,
+                    )
+
+        return report
+
+    def __reduce__(self):
+        # * CUDA events cannot be pickled
+        return (type(self), ())
+
+
+_active: contextvars.ContextVar[Optional[Timings]] = contextvars.ContextVar(
+    "torch_logs.timings", default=None
+)
+
+
+def timed(function: Callable) -> Callable:
+    """Time calls of a logger function into the active `Timings`, if any."""
+    phase = f"logger.{function.__name__}"
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        timings = _active.get()
+        if timings is None or timings.is_running(phase):
+            return function(*args, **kwargs)
+
+        with timings.measure(phase):
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+class TimedIterable:
+    """Iterable which times how long each item takes to produce."""
+
+    def __init__(self, iterable: Iterable, timings: Timings, phase: str):
+        self.iterable = iterable
+        self.timings = timings
+        self.phase = phase
+
+    def __iter__(self) -> Iterator:
+        iterator = iter(self.iterable)
+        while True:
+            with self.timings.measure(self.phase):
+                item = next(iterator, _DONE)
+            if item is _DONE:
+                return
+            yield item
+
+    def __len__(self) -> int:
+        return len(self.iterable)  # type: ignore
+
+
+_DONE = object()
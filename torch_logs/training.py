@@ -1,8 +1,41 @@
+from __future__ import annotations
+
 from .imports import *
 
+import contextvars, json
+
 import torch_logs.logger as logger
 
-from .utils import capture_text_output, latest_numbered_directory
+from .accumulator import EpochLosses, LossAccumulator
+from .checkpoints import CheckpointIndex, CheckpointWriter
+from .distributed import (
+    all_reduce_losses,
+    broadcast_object,
+    gather_object,
+    is_main_process,
+    rank,
+)
+from .memory import MemoryMonitor
+from .metrics import truncate_metrics
+from .plotting import PlotScheduler
+from .profiling import StepProfiler, export_profile
+from .schedules import AllOf, EveryIterations, Schedule, WithinBudget
+from .state import (
+    SkippedBatches,
+    fork_rng,
+    load_loop_state,
+    load_model_weights,
+    loop_state,
+    generator_states,
+    rng_state,
+    set_generator_states,
+    set_rng_state,
+    unwrap_model,
+)
+from .timings import TimedIterable, Timings
+from .utils import TickBatches, capture_text_output
+from .validation import ValidationScheduler, run_validation
+from .writer import MetricWriter
 
 
 class LogEvent(enum.Enum):
@@ -26,65 +59,312 @@ class Training(Generic[Preds]):
     tick_frequency: int = 20
     progress_frequency: int = 200
     checkpoint_frequency: int = 1000
+    # * Replace the frequencies above, e.g. to log by wall time or within a budget
+    tick_schedule: Optional[Schedule] = None
+    progress_schedule: Optional[Schedule] = None
+    checkpoint_schedule: Optional[Schedule] = None
+
+    accumulate_losses: bool = True
+    tick_batches: int = 1
+    fixed_tick_batches: bool = False
 
     save_prediction: Callable[[Any, str], None] = save_image
+    prediction_workers: int = 4
+    prediction_shard_bytes: Optional[int] = None
+
+    async_plots: bool = True
+    html_plots: bool = True
+    async_checkpoints: bool = True
+    async_validation: bool = False
+    max_pending_validations: int = 1
+    mmap_weights: bool = False
+
+    keep_last_checkpoints: Optional[int] = None
+    keep_best_checkpoints: int = 0
+    checkpoint_score: Optional[str] = None
+    checkpoint_score_mode: str = "min"
+
+    # * Fraction of the wall time which logging may take: events without a schedule of their
+    # * own are held to a third of it each, and the overhead is checked against it at the end
+    logging_budget: Optional[float] = None
+    # * Profile the `profile_steps` steps after the checkpoints chosen by `profile_schedule`,
+    # * which is asked at their iterations and defaults to every checkpoint
+    profile_steps: int = 0
+    profile_schedule: Optional[Schedule] = None
+
+    log_rotation_bytes: Optional[int] = None
+    compress_logs: bool = False
+
+    _writer: MetricWriter = dataclasses.field(
+        default_factory=MetricWriter, init=False, repr=False, compare=False
+    )
+    _plots: PlotScheduler = dataclasses.field(
+        default_factory=PlotScheduler, init=False, repr=False, compare=False
+    )
+    _checkpoints: CheckpointWriter = dataclasses.field(
+        default_factory=CheckpointWriter, init=False, repr=False, compare=False
+    )
+    _tick_batches: dict[str, TickBatches] = dataclasses.field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    _timings: Timings = dataclasses.field(
+        default_factory=Timings, init=False, repr=False, compare=False
+    )
+    _memory: MemoryMonitor = dataclasses.field(
+        default_factory=MemoryMonitor, init=False, repr=False, compare=False
+    )
+    _losses: LossAccumulator = dataclasses.field(
+        default_factory=LossAccumulator, init=False, repr=False, compare=False
+    )
+    _epoch_losses: EpochLosses = dataclasses.field(
+        default_factory=EpochLosses, init=False, repr=False, compare=False
+    )
+    _validations: ValidationScheduler = dataclasses.field(
+        default_factory=ValidationScheduler, init=False, repr=False, compare=False
+    )
+    _profiler: StepProfiler = dataclasses.field(
+        default_factory=StepProfiler, init=False, repr=False, compare=False
+    )
 
     def __iter__(
         self,
     ) -> Iterator[LogEvent]:
-        with logger.directory(self.path) as exists_already:
+        # * Each step runs in a context of its own, so that the run directory and timings
+        # * of this training stay apart from those of others iterated in the same thread
+        context = contextvars.copy_context()
+        events = self._events()
+        try:
+            while True:
+                try:
+                    event = context.run(next, events)
+                except StopIteration:
+                    return
+                yield event
+        finally:
+            context.run(events.close)
+
+    def _events(self) -> Iterator[LogEvent]:
+        # * Under torch.distributed every rank yields the same events, but only the main one writes
+        is_main = is_main_process()
+
+        with self._run_directory() as exists_already, self._timings.activate():
             info("Starting training")
 
+            i, skip, on_start = 0, 0, None
+            self._epoch_losses.reset()
             if exists_already:
-                self.rollback()
+                checkpoint = None
+                with self._timings.measure(LogEvent.RESUME.value, overhead=True):
+                    if is_main:
+                        checkpoint = self.rollback()
+                    i, skip, on_start = self._restore_state(
+                        broadcast_object(checkpoint)
+                    )
                 yield LogEvent.RESUME
             else:
-                self.init_logging()
+                if is_main:
+                    with self._timings.measure(LogEvent.INIT.value, overhead=True):
+                        self.init_logging()
                 yield LogEvent.INIT
 
-            i = 0
+            schedules = self._schedules()
+            profile_schedule = self.profile_schedule or EveryIterations(1)
 
-            with logger.progress(self.max_iters) as log_progress:
-                while True:
-                    for _ in self.training_loop:
-                        if i >= self.max_iters:
-                            break
+            try:
+                with logger.progress(self.max_iters) as log_progress:
+                    while i < self.max_iters:
+                        # * Steps taken in the current epoch, which a resumed run skips
+                        step = skip
+                        # * What the loader draws the order of the epoch from
+                        generators = generator_states(self.training_loop.dataloader)
+                        for _, losses in self._training_steps(skip, on_start):
+                            if i >= self.max_iters:
+                                break
+                            step += 1
+
+                            with self._timings.measure("epoch_losses", overhead=True):
+                                self._epoch_losses.add(losses)
+
+                            if self._profiler.step(self._timings.wall["step"].last):
+                                self._stop_profiler(profile_schedule, i)
+
+                            if self.accumulate_losses:
+                                with self._timings.measure(
+                                    "accumulate_losses", overhead=True
+                                ):
+                                    self._losses.add(losses)
+
+                            due = self._due(schedules, i)
+
+                            if due[LogEvent.TICK]:
+                                with self._timings.measure(
+                                    LogEvent.TICK.value, overhead=True
+                                ):
+                                    self.tick_logging(i)
+                                self._triggered(schedules, LogEvent.TICK, i)
+                                yield LogEvent.TICK
+
+                            if due[LogEvent.PROGRESS]:
+                                if is_main:
+                                    with self._timings.measure(
+                                        LogEvent.PROGRESS.value, overhead=True
+                                    ):
+                                        self.progress_logging()
+                                self._triggered(schedules, LogEvent.PROGRESS, i)
+                                yield LogEvent.PROGRESS
+
+                            if due[LogEvent.CHECKPOINT]:
+                                checkpoint = None
+                                with self._timings.measure(
+                                    LogEvent.CHECKPOINT.value, overhead=True
+                                ):
+                                    state = self._training_state(i, step, generators)
+                                    if is_main:
+                                        checkpoint = self.checkpoint_logging(i, state)
+                                self._triggered(schedules, LogEvent.CHECKPOINT, i)
+                                if checkpoint is not None:
+                                    self._start_profiler(
+                                        profile_schedule, i, checkpoint
+                                    )
+                                yield LogEvent.CHECKPOINT
+
+                            i += 1
+                            if is_main:
+                                with self._timings.measure(
+                                    "progress_file", overhead=True
+                                ):
+                                    log_progress(i)
+
+                        else:
+                            # * Only a finished epoch is logged, even when it is the last one
+                            skip, on_start = 0, None
+                            with self._timings.measure(
+                                LogEvent.EPOCH.value, overhead=True
+                            ):
+                                self.epoch_logging()
+                            self._epoch_losses.reset()
+                            yield LogEvent.EPOCH
+            finally:
+                if is_main:
+                    self._stop_profiler(profile_schedule, i)
+                    self._log_validations(self._validations.wait())
+                self._validations.close()
+                self._writer.close()
+                self._plots.close()
+                self._checkpoints.close()
+                if is_main:
+                    logger.log_timings(self._timings, self.logging_budget)
 
-                        if i % self.tick_frequency == 0:
-                            self.tick_logging()
-                            yield LogEvent.TICK
+    @contextlib.contextmanager
+    def _run_directory(self) -> Iterator[bool]:
+        """Enter the run directory on the main process, telling every rank whether it existed."""
+        if not is_main_process():
+            yield broadcast_object(None)
+            return
 
-                        if i % self.progress_frequency == 0:
-                            self.progress_logging()
-                            yield LogEvent.PROGRESS
+        with logger.directory(self.path) as exists_already:
+            yield broadcast_object(exists_already)
+
+    def _schedules(self) -> dict[LogEvent, Schedule]:
+        def default(frequency: int) -> Schedule:
+            if self.logging_budget is None:
+                return EveryIterations(frequency)
+            return AllOf(
+                EveryIterations(frequency), WithinBudget(self.logging_budget / 3)
+            )
 
-                        if i % self.checkpoint_frequency == 0:
-                            self.checkpoint_logging()
-                            yield LogEvent.CHECKPOINT
+        return {
+            LogEvent.TICK: self.tick_schedule or default(self.tick_frequency),
+            LogEvent.PROGRESS: self.progress_schedule
+            or default(self.progress_frequency),
+            LogEvent.CHECKPOINT: self.checkpoint_schedule
+            or default(self.checkpoint_frequency),
+        }
+
+    def _due(self, schedules: dict[LogEvent, Schedule], i: int) -> dict[LogEvent, bool]:
+        due = {event: schedule.due(i) for event, schedule in schedules.items()}
+        if all(schedule.deterministic for schedule in schedules.values()):
+            return due
+        # * Ranks must agree on which events happen, and the clocks of the main process decide
+        return broadcast_object(due)
+
+    def _triggered(
+        self, schedules: dict[LogEvent, Schedule], event: LogEvent, i: int
+    ) -> None:
+        histogram = self._timings.wall.get(event.value)
+        schedules[event].triggered(i, histogram.last if histogram is not None else 0.0)
+
+    def _training_steps(
+        self, skip: int = 0, on_start: Optional[Callable[[], None]] = None
+    ) -> Iterator[Any]:
+        """
+        Iterate over the training loop, timing data loading apart from each whole step.
+        The first `skip` batches of the epoch are skipped, and `on_start` is called
+        once the first batch is loaded.
+        """
+        loop = self.training_loop
+        dataloader = loop.dataloader
+        steps = iter(loop)
 
-                        i += 1
-                        log_progress(i)
+        try:
+            # * The loop only reads its dataloader once its first step starts
+            loop.dataloader = TimedIterable(
+                (
+                    SkippedBatches(dataloader, skip, on_start)
+                    if skip > 0 or on_start is not None
+                    else dataloader
+                ),
+                self._timings,
+                "data",
+            )
+            with self._timings.measure("step"):
+                step = next(steps, None)
+        finally:
+            loop.dataloader = dataloader
 
-                    self.epoch_logging()
-                    yield LogEvent.EPOCH
+        while step is not None:
+            yield step
+            with self._timings.measure("step"):
+                step = next(steps, None)
+
+    def pending_checkpoints(self) -> list[str]:
+        return self._checkpoints.pending()
+
+    def wait_for_checkpoints(self) -> None:
+        self._checkpoints.wait()
+
+    def checkpoint_index(self) -> CheckpointIndex:
+        return CheckpointIndex(self.path + "/checkpoints")
 
     def latest_checkpoint_path(self):
-        num = latest_numbered_directory(self.path + "/checkpoints")
-        assert num != -1
-        return f"checkpoints/{num:05d}"
+        latest = self.checkpoint_index().latest()
+        assert latest is not None
+        return f"checkpoints/{latest['number']:05d}"
+
+    def best_checkpoint_path(
+        self, score: Optional[str] = None, mode: Optional[str] = None
+    ) -> str:
+        score = score or self.checkpoint_score
+        assert score is not None, "No score to rank the checkpoints by"
+        best = self.checkpoint_index().best(score, mode or self.checkpoint_score_mode)
+        assert best is not None
+        return f"checkpoints/{best['number']:05d}"
+
+    def nearest_checkpoint_path(self, iteration: int) -> str:
+        nearest = self.checkpoint_index().nearest(iteration)
+        assert nearest is not None
+        return f"checkpoints/{nearest['number']:05d}"
 
     @torch.no_grad()
     def init_logging(self) -> None:
         info("Logging init")
 
-        if "pytest" not in sys.argv[0]:  # todo figure out why this fails in tests
-            capture_text_output()
-        else:
-            info("In pytest - log capture disabled")
+        capture_text_output(
+            max_bytes=self.log_rotation_bytes, compress=self.compress_logs
+        )
 
         logger.log_pid()
         logger.log_config()
-        logger.log_max_memory()
 
         logger.log_architecture(self.training_loop.model)
 
@@ -94,72 +374,344 @@ class Training(Generic[Preds]):
         logger.create_symbolic_link(self.path)
 
     @torch.no_grad()
-    def tick_logging(self) -> None:
+    def tick_logging(self, iteration: Optional[int] = None) -> None:
         info("Logging tick")
 
-        train_batch = next(iter(self.training_loop.dataloader))
-        logger.log_losses(self.training_loop.evaluation(train_batch))
+        statistics = None
+        if self.accumulate_losses and len(self._losses) > 0:
+            training, statistics = self._losses.statistics()
+        else:
+            training = self._tick_evaluation("training", self.training_loop.dataloader)
 
+        losses = [training]
         if self.validation_loop is not None:
-            validation_batch = next(iter(self.validation_loop.dataloader))
-            logger.log_losses(
-                self.training_loop.evaluation(validation_batch), validation=True
+            losses.append(
+                self._tick_evaluation("validation", self.validation_loop.dataloader)
             )
 
-        logger.log_max_memory()
+        losses = all_reduce_losses(*losses)
+        if not is_main_process():
+            return
+
+        with self._writer.batch():
+            logger.log_losses(losses[0], writer=self._writer)
+            if len(losses) > 1:
+                logger.log_losses(losses[1], validation=True, writer=self._writer)
+            if statistics is not None:
+                logger.log_loss_statistics(statistics, writer=self._writer)
+
+            logger.log_memory(self._memory, writer=self._writer)
+            if iteration is not None:
+                logger.log_tick(iteration, writer=self._writer)
 
     @torch.no_grad()
     def progress_logging(self) -> None:
         info("Logging progress")
 
-        logger.plot_losses(self.progress_frequency)
+        self._writer.flush()
+        self._plot(logger.plot_losses, self.tick_frequency)
+        self._plot(logger.plot_memory, self.tick_frequency)
+        logger.log_max_memory(self._memory)
+        logger.log_timings(self._timings, self.logging_budget)
+        self._log_validations(self._validations.collect())
 
     @torch.no_grad()
-    def checkpoint_logging(self) -> None:
+    def checkpoint_logging(
+        self, iteration: Optional[int] = None, state: Optional[dict[str, Any]] = None
+    ) -> str:
+        """Log a checkpoint, returning its directory."""
         info("Logging checkpoint")
 
+        self._writer.flush()
         scores = None
 
-        with self._atomic_checkpoint_dir():
+        checkpoints = self._checkpoints if self.async_checkpoints else None
+
+        with self._atomic_checkpoint_dir() as checkpoint:
+            number = int(os.path.basename(checkpoint))
             logger.log_model(
                 self.validation_loop.model
                 if self.validation_loop is not None
-                else self.training_loop.model
+                else self.training_loop.model,
+                checkpoints,
+                self.mmap_weights,
             )
-            logger.log_training(self)
+            if state is not None:
+                logger.log_state(state, checkpoints)
 
-            if self.validation_loop is not None:
+            if self.validation_loop is not None and not self.async_validation:
                 scores = self._run_validation_loop()
 
         if scores is not None:
-            logger.log_scores(scores)
+            logger.log_scores(scores, writer=self._writer, checkpoint=number)
+        self._writer.flush()
+
+        # * Recorded last, so that resuming from this checkpoint keeps its scores
+        with logger.directory(checkpoint):
+            logger.log_metric_offsets("../..")
 
-        logger.plot_scores()
+        self._index_checkpoint(checkpoint, iteration, scores)
 
+        if scores is not None:
+            self._plot(logger.plot_scores)
+
+        if self.validation_loop is not None and self.async_validation:
+            self._log_validations(self._validations.collect())
+            self._submit_validation(number, checkpoint)
+
+        return checkpoint
+
+    def _index_checkpoint(
+        self, checkpoint: str, iteration: Optional[int], scores: Optional[Scores]
+    ) -> None:
+        index = CheckpointIndex("checkpoints")
+        number = int(os.path.basename(checkpoint))
+        # * Marked complete once its files are written, since only complete ones are resumed
+        index.add(number, iteration, scores, complete=False)
+        self._checkpoints.then(index.complete, number)
+
+        if self.keep_last_checkpoints is not None:
+            removed = index.prune(
+                self.keep_last_checkpoints,
+                self.keep_best_checkpoints,
+                self.checkpoint_score,
+                self.checkpoint_score_mode,
+                # * Checkpoints are only deleted once the worker is done evaluating them,
+                # * and once the steps after them are profiled
+                [*self._validations.pending(), *self._profiled_checkpoints()],
+            )
+            if len(removed) > 0:
+                info(f"- Removing {len(removed)} old checkpoint(s)")
+                self._checkpoints.remove(removed)
 
     def epoch_logging(self) -> None:
         assert self.training_loop.last_epoch_losses is not None
-        logger.log_epoch_losses(self.training_loop.last_epoch_losses)
-        logger.plot_epoch_losses()
-
+        # * Along with the steps taken before resuming, if the epoch started before
+        (losses,) = all_reduce_losses(
+            self._epoch_losses.complete(
+                self.training_loop.last_epoch_losses, len(self.training_loop)
+            )
+        )
+        if not is_main_process():
+            return
+
+        logger.log_epoch_losses(losses, writer=self._writer)
+        self._writer.flush()
+        self._plot(logger.plot_epoch_losses)
+
+
+    def _tick_evaluation(self, name: str, dataloader: Iterable) -> Losses:
+        if name not in self._tick_batches:
+            self._tick_batches[name] = TickBatches(dataloader, self.fixed_tick_batches)
+
+        # * Tick evaluations draw from the RNGs too, and their iterators start anew on resume
+        with fork_rng():
+            losses = [
+                self.training_loop.evaluation(batch)
+                for batch in self._tick_batches[name].take(self.tick_batches)
+            ]
+        if len(losses) == 1:
+            return losses[0]
+
+        # * Averaged on the device, so the writer still copies a single row to the host
+        return {
+            key: torch.stack([l[key].detach() for l in losses]).mean(dim=0)
+            for key in losses[0].keys()
+        }
+
+    def _start_profiler(
+        self, schedule: Schedule, iteration: int, checkpoint: str
+    ) -> None:
+        if (
+            self.profile_steps <= 0
+            or self._profiler.directory is not None
+            or not schedule.due(iteration)
+        ):
+            return
+
+        info(f"- Profiling the next {self.profile_steps} step(s)")
+        self._profiler.start(f"{checkpoint}/profile", self.profile_steps)
+
+    def _stop_profiler(self, schedule: Schedule, iteration: int) -> None:
+        stopped = self._profiler.stop()
+        if stopped is None:
+            return
+
+        profile, directory, overhead = stopped
+        cost = overhead["extra_s"] + overhead["stop_s"]
+        self._timings.add("profiler", cost, overhead=True)
+        schedule.triggered(iteration, cost)
+        info(
+            f"- Profiled {overhead['steps']} step(s), "
+            f"taking {overhead['step_ms']:.1f} ms each"
+        )
+
+        # * Written on the writer thread, after the files of the checkpoint
+        self._checkpoints.then(export_profile, profile, directory, overhead)
+
+    def _profiled_checkpoints(self) -> list[int]:
+        directory = self._profiler.directory
+        if directory is None:
+            return []
+        return [int(os.path.basename(os.path.dirname(directory)))]
+
+    def _plot(self, function: Callable, *args: Any) -> None:
+        if self.async_plots:
+            self._plots.submit(function, *args, html=self.html_plots)
+        else:
+            function(*args, html=self.html_plots)
 
     def _run_validation_loop(self) -> Scores:
         assert self.validation_loop is not None
 
-        with logger.progress(len(self.validation_loop)) as log_progress:
-            scores = None
-            with logger.directory("predictions"):
-                for j, (preds, scores) in enumerate(self.validation_loop):
-                    logger.log_predictions(j, preds, self.save_prediction)
-                    log_progress(j)
+        # * Validation reseeds the RNGs, which must not affect training for it to resume exactly
+        with fork_rng():
+            return run_validation(
+                self.validation_loop,
+                self.save_prediction,
+                self.prediction_workers,
+                self.prediction_shard_bytes,
+            )
+
+    def _training_state(
+        self,
+        iteration: int,
+        epoch_step: int,
+        epoch_generators: list[torch.Tensor],
+    ) -> Optional[dict[str, Any]]:
+        """
+        What it takes to resume right after `iteration`, on the main process: the step
+        within the epoch, the states of the optimizers, and the RNGs, sums of the epoch
+        losses and accumulated losses of every rank, and the weights of the model if the
+        checkpoint does not hold them already. The states of the generators of the
+        dataloader are saved as they were when the epoch started, and as they are now.
+        """
+        local = {
+            "rng": rng_state(),
+            "epoch_losses": self._epoch_losses.sums(),
+            "losses": self._losses.state(),
+            "epoch_generators": epoch_generators,
+            "generators": generator_states(self.training_loop.dataloader),
+        }
+        ranks = gather_object(local)
+        if not is_main_process():
+            return None
+
+        state = {
+            "iteration": iteration,
+            "epoch_step": epoch_step,
+            "loop": loop_state(self.training_loop),
+        } | {key: [states[key] for states in ranks] for key in local}
+
+        model = unwrap_model(self.training_loop.model)
+        logged = (
+            self.validation_loop.model
+            if self.validation_loop is not None
+            else self.training_loop.model
+        )
+        if isinstance(model, nn.Module) and model is not logged:
+            state["model"] = model.state_dict()
+        return state
+
+    def _restore_state(
+        self, checkpoint: Optional[str]
+    ) -> tuple[int, int, Optional[Callable[[], None]]]:
+        """
+        Load the training state of a checkpoint, on every rank. Returns the iteration
+        and epoch step to resume at, and what restores the RNGs once data loading starts.
+        The generators of the dataloader are set to draw the order of the epoch again
+        first, and to their states at the checkpoint along with the RNGs.
+        """
+        if checkpoint is None:
+            return 0, 0, None
+
+        state = torch.load(
+            f"{checkpoint}/state.pt", map_location="cpu", weights_only=False
+        )
+        if "model" in state:
+            unwrap_model(self.training_loop.model).load_state_dict(state["model"])
+        elif isinstance(self.training_loop.model, nn.Module):
+            load_model_weights(self.training_loop.model, checkpoint)
+        load_loop_state(self.training_loop, state["loop"])
+
+        def own(key: str) -> Any:
+            # * A run resumed on more ranks than were saved starts them all as the first
+            states = state.get(key)
+            if states is None:
+                return None
+            return states[rank()] if rank() < len(states) else states[0]
+
+        loader = self.training_loop.dataloader
+        rng, generators = own("rng"), own("generators")
+        if "losses" in state:
+            self._losses.load_state(own("losses"))
+
+        def restore_rngs() -> None:
+            set_rng_state(rng)
+            if generators is not None:
+                set_generator_states(loader, generators)
+
+        skip = state["epoch_step"]
+        try:
+            finished = skip >= len(loader)  # type: ignore
+        except TypeError:  # * Without a length, the epoch is assumed to be unfinished
+            finished = False
+        if finished:
+            # * The next epoch starts as it would have, from the RNG states it would have seen
+            restore_rngs()
+            return state["iteration"] + 1, 0, None
+
+        # * The loader draws the order of the epoch again, even from a generator of its own
+        if own("epoch_generators") is not None:
+            set_generator_states(loader, own("epoch_generators"))
+        self._epoch_losses.reset(own("epoch_losses"))
+        return state["iteration"] + 1, skip, restore_rngs
+
+    def _submit_validation(self, number: int, checkpoint: str) -> None:
+        assert self.validation_loop is not None
+
+        # * The worker reads the weights once the checkpoint writer is done with them
+        ready = self._checkpoints.then(lambda: None)
+        self._validations.max_pending = self.max_pending_validations
+        self._validations.submit(
+            number,
+            checkpoint,
+            self.validation_loop,
+            ready,
+            save_prediction=self.save_prediction,
+            prediction_workers=self.prediction_workers,
+            prediction_shard_bytes=self.prediction_shard_bytes,
+        )
+
+    def _log_validations(
+        self, results: list[tuple[int, Optional[Scores], Optional[str]]]
+    ) -> None:
+        """Log the scores of the checkpoints evaluated by the worker, in order."""
+        index = CheckpointIndex("checkpoints")
+        numbers = []
+        for number, scores, error in results:
+            if scores is None:
+                warn(f"Validation of checkpoint {number:05d} failed:\n{error}")
+                continue
+            logger.log_scores(scores, writer=self._writer, checkpoint=number)
+            index.update(
+                number, scores={key: float(value) for key, value in scores.items()}
+            )
+            numbers.append(number)
+
+        if len(numbers) == 0:
+            return
+        self._writer.flush()
 
-        assert scores is not None
-        return scores
+        # * So that resuming from any checkpoint since keeps these scores
+        for entry in index.entries:
+            if entry["number"] >= numbers[0] and os.path.exists(
+                f"{index.path_of(entry)}/metrics.json"
+            ):
+                with logger.directory(index.path_of(entry)):
+                    logger.log_metric_offsets("../..", ["scores.metrics"])
 
-    def _backup_losses(self):
-        """Backup losses into the checkpoint so we can restore them on resume"""
-        shutil.copyfile("../../training_losses.csv", "training_losses.csv")
-        shutil.copyfile("../../validation_losses.csv", "validation_losses.csv")
+        self._plot(logger.plot_scores)
 
     @contextlib.contextmanager
     def _atomic_checkpoint_dir(self):
@@ -170,30 +722,63 @@ class Training(Generic[Preds]):
         try:
             # * The calls are split in two so that the empty parent directory exists the first time around
             with logger.directory("checkpoints"):
-                num = latest_numbered_directory(".") + 1
+                num = CheckpointIndex(".").next_number()
                 with logger.directory(f"{num:05d}"):
-                    yield
+                    yield f"checkpoints/{num:05d}"
         except Exception as e:
             try:
-                path = self.latest_checkpoint_path()
-                shutil.rmtree(f"{path}.incomplete")  # type: ignore
-                shutil.move(f"{path}", f"{path}.incomplete")  # type: ignore
+                path = logger.resolve(f"checkpoints/{num:05d}")
+                shutil.rmtree(f"{path}.incomplete", ignore_errors=True)
+                shutil.move(f"{path}", f"{path}.incomplete")
             except UnboundLocalError:
                 pass
-            except AssertionError:
-                pass
             raise e
 
-    def rollback(self):
+    def rollback(self) -> Optional[str]:
+        """
+        Roll the metrics back to the latest checkpoint with a training state,
+        returning its directory, if any.
+        """
         info("Performing rollback")
-        try:
-            rollback_path = self.latest_checkpoint_path()
-        except AssertionError:
+        index = CheckpointIndex("checkpoints")
+        for path in index.discard_incomplete():
+            warn(f"Removing {path}, whose files were not all written")
+            shutil.rmtree(path, ignore_errors=True)
+
+        entries = index.complete_entries
+        if len(entries) == 0:
             info("No checkpoint found - training normally")
+            return None
+
+        # * Chosen before anything is truncated, since training resumes from its state
+        resumable = [
+            e for e in entries if os.path.exists(f"{index.path_of(e)}/state.pt")
+        ]
+        if len(resumable) == 0:
+            raise RuntimeError(
+                f"None of the {len(entries)} checkpoint(s) of {index.directory} "
+                "has a training state to resume from"
+            )
+        latest = resumable[-1]
+        if latest is not entries[-1]:
+            warn(
+                f"Checkpoint {entries[-1]['number']:05d} has no training state - "
+                f"falling back to {latest['number']:05d} and removing those after it"
+            )
+            for path in index.discard_after(latest["number"]):
+                shutil.rmtree(path, ignore_errors=True)
+
+        rollback_path = f"checkpoints/{latest['number']:05d}"
+        warn(f"Resuming from {rollback_path}")
+
+        if not os.path.exists(logger.resolve(f"{rollback_path}/metrics.json")):
+            warn(
+                f"{rollback_path} has no metric offsets - keeping the metrics as they are"
+            )
         else:
-            warn(f"Resuming from {rollback_path}")
-            # Discard the lost iterations from the losses
-            shutil.copyfile(f"{path}/training_losses.csv", "training_losses.csv")
-            shutil.copyfile(f"{path}/validation_losses.csv", "validation_losses.csv")
-            logger.plot_losses(self.progress_frequency)
+            # * Discard the metrics of the iterations lost since the checkpoint, in place
+            with open(logger.resolve(f"{rollback_path}/metrics.json")) as file:
+                truncate_metrics(json.load(file), logger.resolve("."))
 
+        self._plot(logger.plot_losses, self.tick_frequency)
+        return logger.resolve(rollback_path)
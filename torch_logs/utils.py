@@ -1,41 +1,107 @@
 from .imports import *
 
-import logging, sys, atexit
+import logging, sys, atexit, threading
 from pathlib import Path
 
+from .capture import OutputCapture
+
+_capture: Optional[OutputCapture] = None
+_prints_on_quit = False
+
+
+def capture_text_output(
+    unbuffered=True,
+    max_bytes: Optional[int] = None,
+    backups: int = 5,
+    compress: bool = False,
+) -> OutputCapture:
+    global _capture
 
-def capture_text_output(unbuffered=True):
     if unbuffered:
         os.environ["PYTHONUNBUFFERED"] = "1"
 
-    configure_text_logging()
-    tee_output()
-    print_on_quit()
-
+    if _capture is not None:
+        _capture.close()
+    _capture = OutputCapture(".", max_bytes, backups, compress).start()
 
-def configure_text_logging():
-    py_logger = logging.getLogger("torch_loops")
+    print_on_quit()
+    return _capture
 
-    handler = logging.FileHandler("loops.log")
-    handler.setFormatter(
-        logging.Formatter(
-            fmt="%(asctime)s %(levelname)s %(message)s", datefmt="%H:%M:%S"
-        )
-    )
-    py_logger.addHandler(handler)
-    py_logger.setLevel(logging.INFO)
 
+def configure_text_logging() -> OutputCapture:
+    """Copy the `torch_loops` logger into `loops.log`, along with stdout and stderr."""
+    return _capture if _capture is not None else capture_text_output(unbuffered=False)
 
-def tee_output():
-    tee = subprocess.Popen(["tee", "stdout.log"], stdin=subprocess.PIPE)
-    os.dup2(tee.stdin.fileno(), sys.stdout.fileno())  # type: ignore
 
-    tee = subprocess.Popen(["tee", "stderr.log"], stdin=subprocess.PIPE)
-    os.dup2(tee.stdin.fileno(), sys.stderr.fileno())  # type: ignore
+def tee_output() -> OutputCapture:
+    """Copy stdout and stderr into `stdout.log` and `stderr.log`, along with the logger."""
+    return _capture if _capture is not None else capture_text_output(unbuffered=False)
 
 
 def print_on_quit():
-    atexit.register(lambda: print("QUIT", file=sys.stderr))
+    global _prints_on_quit
+
+    # * Registered once, however many times the output is captured
+    if not _prints_on_quit:
+        atexit.register(lambda: print("QUIT", file=sys.stderr))
+        _prints_on_quit = True
+
+
+class TickBatches:
+    """
+    Draws the batches of tick evaluations from a long-lived iterator, restarted when
+    exhausted, instead of creating a new iterator (and its worker processes) every tick.
+    With `fixed`, the first batches drawn are kept and reused on every tick instead.
+    """
+
+    def __init__(self, dataloader: Iterable, fixed: bool = False):
+        self.dataloader = dataloader
+        self.fixed = fixed
+        self._iterator: Optional[Iterator] = None
+        self._cache: list = []
+
+    def take(self, n: int) -> list:
+        if self.fixed:
+            while len(self._cache) < n:
+                self._cache.append(self._next())
+            return self._cache[:n]
+
+        return [self._next() for _ in range(n)]
+
+    def _next(self) -> Any:
+        if self._iterator is not None:
+            try:
+                return next(self._iterator)
+            except StopIteration:
+                pass
+
+        self._iterator = iter(self.dataloader)
+        return next(self._iterator)
+
+    def __reduce__(self):
+        # * Iterators over dataloaders with workers cannot be pickled
+        return (type(self), (self.dataloader, self.fixed))
+
+
+@contextlib.contextmanager
+def atomic_path(path: str) -> Iterator[str]:
+    """
+    Yield a temporary path next to `path`, which replaces `path` once the block succeeds.
+    The extension is kept, since some writers pick the format from it.
+    """
+    head, tail = os.path.split(path)
+    stem, extension = os.path.splitext(tail)
+    # * Unique per thread, since several threads may write the same file
+    temporary = os.path.join(
+        head, f".{stem}.{os.getpid()}.{threading.get_ident()}.tmp{extension}"
+    )
+
+    try:
+        yield temporary
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
 
 
 def latest_numbered_directory(path: str):
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+from .imports import *
+
+import collections, functools, threading, pickle, traceback, atexit
+from concurrent.futures import Future
+
+import torch_logs.logger as logger
+
+from .context import resolve
+from .predictions import (
+    PredictionArchiveWriter,
+    PredictionExporter,
+    encode_png,
+    encode_with,
+)
+from .weights import load_weights
+from .workers import WorkerProcess, worker_channel
+
+
+def run_validation(
+    validation_loop: EvaluationLoop,
+    save_prediction: Callable[[Any, str], None] = save_image,
+    prediction_workers: int = 4,
+    prediction_shard_bytes: Optional[int] = None,
+) -> Scores:
+    """Run the validation loop, writing its predictions into `predictions/`."""
+    with logger.progress(len(validation_loop)) as log_progress:
+        scores = None
+        with logger.directory("predictions"):
+            exporter = prediction_exporter(
+                save_prediction, prediction_workers, prediction_shard_bytes
+            )
+            try:
+                for j, (preds, scores) in enumerate(validation_loop):
+                    logger.log_predictions(j, preds, save_prediction, exporter=exporter)
+                    log_progress(j)
+            finally:
+                if exporter is not None:
+                    exporter.close()
+
+    assert scores is not None
+    return scores
+
+
+def prediction_exporter(
+    save_prediction: Callable[[Any, str], None],
+    prediction_workers: int,
+    prediction_shard_bytes: Optional[int],
+) -> Optional[Union[PredictionExporter, PredictionArchiveWriter]]:
+    if prediction_shard_bytes is not None:
+        # * Other functions than the default are honoured, at the cost of a temporary file
+        encode = (
+            encode_png
+            if save_prediction is save_image
+            else functools.partial(encode_with, save_prediction)
+        )
+        return PredictionArchiveWriter(
+            ".",
+            prediction_shard_bytes,
+            encode=encode,
+            max_workers=max(prediction_workers, 1),
+        )
+    if prediction_workers > 0:
+        return PredictionExporter(save_prediction, prediction_workers)
+    return None
+
+
+class ValidationScheduler:
+    """
+    Evaluates checkpoints in a worker process while training continues.
+
+    Like that of `PlotScheduler`, the worker is a fresh interpreter. It receives the
+    validation loop once; then, for each checkpoint, it loads the saved weights into
+    the model, writes the predictions into the checkpoint directory and sends back
+    the scores. Checkpoints are evaluated one at a time, in the order they were
+    submitted, and `submit` blocks while `max_pending` of them are still waiting or
+    running. Since the loop is unpickled in another interpreter, its metrics and
+    `save_prediction` must be importable, rather than defined in the training script.
+    """
+
+    def __init__(self, max_pending: int = 1):
+        assert max_pending >= 1
+        self.max_pending = max_pending
+
+        self._setup: Optional[bytes] = None
+        self._jobs: collections.deque = collections.deque()
+        self._results: list[tuple[int, Optional[Scores], Optional[str]]] = []
+        self._closing = False
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._process = WorkerProcess("torch_logs.validation")
+
+    def submit(
+        self,
+        number: int,
+        directory: str,
+        validation_loop: EvaluationLoop,
+        ready: Optional[Future] = None,
+        **options: Any,
+    ) -> None:
+        """
+        Evaluate the checkpoint saved in `directory`, once `ready` is done,
+        unless it failed.
+        The `options` are those of `run_validation`.
+        """
+        if self._setup is None:
+            # * Pickled on the training thread, since the worker loads its own weights anyway
+            self._setup = pickle.dumps((validation_loop, options))
+
+        with self._condition:
+            self._condition.wait_for(lambda: len(self._jobs) < self.max_pending)
+            self._start()
+            self._jobs.append((number, resolve(directory), ready))
+            self._condition.notify_all()
+
+    def pending(self) -> list[int]:
+        """Numbers of the checkpoints still waiting or being evaluated."""
+        with self._condition:
+            return [number for number, _, _ in self._jobs]
+
+    def collect(self) -> list[tuple[int, Optional[Scores], Optional[str]]]:
+        """
+        Take the evaluations finished so far, in order, as `(number, scores, error)`.
+        Either the scores or the traceback of the error is None.
+        """
+        with self._condition:
+            results, self._results = self._results, []
+        return results
+
+    def wait(self) -> list[tuple[int, Optional[Scores], Optional[str]]]:
+        """Wait for every submitted checkpoint, then `collect`."""
+        with self._condition:
+            self._condition.wait_for(lambda: len(self._jobs) == 0)
+        return self.collect()
+
+    def close(self) -> None:
+        atexit.unregister(self.close)
+
+        with self._condition:
+            self._condition.wait_for(lambda: len(self._jobs) == 0)
+            self._closing = True
+            self._condition.notify_all()
+            thread, self._thread = self._thread, None
+
+        if thread is not None:
+            thread.join()
+
+        self._closing = False
+
+    def __reduce__(self):
+        return (type(self), (self.max_pending,))
+
+    def _start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._dispatch,
+                name="torch_logs.ValidationScheduler",
+                daemon=True,
+            )
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _dispatch(self) -> None:
+        try:
+            while True:
+                with self._condition:
+                    self._condition.wait_for(lambda: self._jobs or self._closing)
+                    if len(self._jobs) == 0:
+                        return
+                    number, directory, ready = self._jobs[0]
+
+                failed = ready.exception() if ready is not None else None
+                if failed is not None:
+                    scores, error = None, f"The checkpoint was not written: {failed}"
+                else:
+                    try:
+                        scores, error = self._run(directory)
+                    except Exception:
+                        scores, error = None, traceback.format_exc()
+                        self._process.stop()
+
+                with self._condition:
+                    self._jobs.popleft()
+                    self._results.append((number, scores, error))
+                    self._condition.notify_all()
+        finally:
+            self._process.stop()
+
+    def _run(self, directory: str) -> tuple[Optional[Scores], Optional[str]]:
+        if not self._process.running():
+            self._process.start()
+            self._process.send(self._setup)
+        self._process.send(directory)
+        return self._process.receive()
+
+
+def _load_checkpoint(validation_loop: EvaluationLoop) -> None:
+    """Load the model saved in the current directory into the validation loop."""
+    model = validation_loop.model
+    if isinstance(model, nn.Module) and os.path.exists(resolve("weights.pt")):
+        weights = (
+            load_weights(resolve("weights.tensors"), lazy=True)
+            if os.path.exists(resolve("weights.tensors"))
+            else torch.load(resolve("weights.pt"), map_location="cpu")
+        )
+        model.load_state_dict(weights)
+    else:
+        validation_loop.model = torch.load(
+            resolve("model.pt"), map_location="cpu", weights_only=False
+        )
+
+
+def _worker() -> None:
+    jobs, reply = worker_channel()
+
+    setup = next(jobs, None)
+    if setup is None:
+        return
+
+    # * The loop is unpickled apart from the stream, so that failing to do so is reported per job
+    try:
+        validation_loop, options = pickle.loads(setup)
+        setup_error = None
+    except Exception:
+        setup_error = traceback.format_exc()
+
+    for directory in jobs:
+        try:
+            if setup_error is not None:
+                raise RuntimeError(
+                    f"Unable to load the validation loop:\n{setup_error}"
+                )
+            with logger.directory(directory):
+                _load_checkpoint(validation_loop)
+                result = (run_validation(validation_loop, **options), None)
+        except Exception:
+            result = (None, traceback.format_exc())
+
+        reply(result)
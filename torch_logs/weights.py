@@ -0,0 +1,114 @@
+from .imports import *
+
+import json, mmap, struct
+
+# Layout of a `.tensors` file:
+#   magic (8 bytes) | header length (uint64) | JSON header padded to the alignment,
+#   followed by the raw bytes of every tensor, each starting at an aligned offset.
+# The header maps each name to its dtype, shape and offset from the end of the header.
+
+MAGIC = b"TLTENSR1"
+_PREFIX = struct.Struct("<8sQ")
+_ALIGNMENT = 64
+
+
+def save_weights(
+    state_dict: Mapping[str, torch.Tensor], file: Union[str, BinaryIO]
+) -> None:
+    """Write tensors as raw bytes behind a JSON header, so that `load_weights` can map them."""
+    if isinstance(file, str):
+        with open(file, "wb") as f:
+            return save_weights(state_dict, f)
+
+    tensors = {
+        name: tensor.detach().to("cpu").contiguous()
+        for name, tensor in state_dict.items()
+    }
+
+    entries = {}
+    offset = 0
+    for name, tensor in tensors.items():
+        entries[name] = {
+            "dtype": str(tensor.dtype).removeprefix("torch."),
+            "shape": list(tensor.shape),
+            "offset": offset,
+        }
+        offset = _align(offset + tensor.numel() * tensor.element_size())
+
+    # * The header is padded so that the data, hence every tensor, starts aligned
+    header = json.dumps(entries).encode()
+    data_start = _align(_PREFIX.size + len(header))
+    file.write(_PREFIX.pack(MAGIC, data_start - _PREFIX.size))
+    file.write(header.ljust(data_start - _PREFIX.size, b" "))
+
+    position = 0
+    for name, tensor in tensors.items():
+        padding = entries[name]["offset"] - position
+        file.write(b"\0" * padding)
+        data = tensor.reshape(-1).view(torch.uint8).numpy()
+        file.write(memoryview(data))
+        position += padding + len(data)
+
+
+class WeightFile(Mapping[str, torch.Tensor]):
+    """
+    Tensors of a `.tensors` file, built on demand from a copy-on-write memory map.
+
+    Tensors share the pages of the file, so every process loading the same file shares
+    a single copy in the page cache, and nothing is read until a tensor is used.
+    Writing to a tensor only copies the pages written to, never the file itself.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+        with open(path, "rb") as file:
+            magic, length = _PREFIX.unpack(file.read(_PREFIX.size))
+            assert magic == MAGIC, f"'{path}' is not a weight file"
+            self.entries: dict[str, dict[str, Any]] = json.loads(file.read(length))
+            self.data_start = _PREFIX.size + length
+
+            size = os.fstat(file.fileno()).st_size
+            # * The map stays valid once the file is closed, for as long as tensors use it
+            self._map = (
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+                if size > 0
+                else None
+            )
+
+    def __getitem__(self, name: str) -> torch.Tensor:
+        entry = self.entries[name]
+        dtype = getattr(torch, entry["dtype"])
+        shape = entry["shape"]
+
+        count = int(np.prod(shape))
+        if count == 0:
+            return torch.empty(shape, dtype=dtype)
+
+        return torch.frombuffer(
+            self._map,  # type: ignore
+            dtype=dtype,
+            count=count,
+            offset=self.data_start + entry["offset"],
+        ).reshape(shape)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+def load_weights(
+    path: str, lazy: bool = False
+) -> Union[dict[str, torch.Tensor], WeightFile]:
+    """
+    Map the tensors of a `.tensors` file without copying them.
+    With `lazy`, each tensor is only built when it is first accessed.
+    """
+    weights = WeightFile(path)
+    return weights if lazy else dict(weights)
+
+
+def _align(offset: int) -> int:
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
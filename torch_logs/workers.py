@@ -0,0 +1,80 @@
+from .imports import *
+
+import pickle
+
+
+class WorkerProcess:
+    """
+    A worker running `_worker()` from `module` in a fresh interpreter rather than a fork,
+    so that it neither inherits CUDA state nor re-runs the training script.
+
+    Objects are pickled to its stdin and its replies read back from its stdout. It runs
+    in the root directory, which unlike that of the training is never deleted, so jobs
+    must carry absolute paths. It is stopped with a `None` job rather than by closing
+    the pipe, since processes forked meanwhile, like dataloader workers, may hold it open.
+    """
+
+    def __init__(self, module: str):
+        self.module = module
+        self._process: Optional[subprocess.Popen] = None
+
+    def running(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def start(self) -> None:
+        self._process = subprocess.Popen(
+            [sys.executable, "-c", f"import {self.module} as m; m._worker()"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            cwd=os.path.abspath(os.sep),
+            env=os.environ
+            | {"PYTHONPATH": os.pathsep.join(map(os.path.abspath, sys.path))},
+        )
+
+    def send(self, obj: Any) -> None:
+        assert self._process is not None and self._process.stdin is not None
+        pickle.dump(obj, self._process.stdin)
+        self._process.stdin.flush()
+
+    def receive(self) -> Any:
+        assert self._process is not None and self._process.stdout is not None
+        return pickle.load(self._process.stdout)
+
+    def stop(self) -> None:
+        process, self._process = self._process, None
+        if process is None or process.poll() is not None:
+            return
+
+        assert process.stdin is not None
+        with contextlib.suppress(OSError):
+            pickle.dump(None, process.stdin)
+            process.stdin.flush()
+        with contextlib.suppress(OSError):
+            process.stdin.close()
+        process.wait()
+
+
+def worker_channel() -> tuple[Iterator[Any], Callable[[Any], None]]:
+    """
+    In a worker, the jobs sent to it until it is stopped, and a function sending back
+    a reply. Stray prints, e.g. from plotting libraries, go to stderr instead of stdout.
+    """
+    jobs = sys.stdin.buffer
+    replies = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    def receive() -> Iterator[Any]:
+        while True:
+            try:
+                job = pickle.load(jobs)
+            except EOFError:
+                return
+            if job is None:
+                return
+            yield job
+
+    def reply(obj: Any) -> None:
+        pickle.dump(obj, replies)
+        replies.flush()
+
+    return receive(), reply
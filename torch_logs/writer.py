@@ -0,0 +1,169 @@
+from .imports import *
+
+import threading, queue, atexit
+
+from .context import resolve
+from .metrics import MetricStore
+
+
+class MetricWriter:
+    """
+    Appends rows of metrics to `.metrics` files from a background thread.
+
+    Tensors are copied to pinned host memory without blocking the training thread,
+    and rows are written out in batches through stores which are kept open.
+    Call `flush` before reading the files back (plots, checkpoints).
+    """
+
+    def __init__(self, max_pending: int = 1024, batch_size: int = 256):
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+
+        self._queue: queue.Queue = queue.Queue(max_pending)
+        self._thread: Optional[threading.Thread] = None
+        self._stores: dict[str, MetricStore] = {}
+        self._error: Optional[BaseException] = None
+        self._lock = threading.Lock()
+        self._batched: Optional[list[tuple[str, Mapping[str, Any], str]]] = None
+
+    def write(self, path: str, row: Mapping[str, Any], dtype: str = "<f8") -> None:
+        if self._batched is not None:
+            self._batched.append((resolve(path), row, dtype))
+            return
+
+        self._raise_pending_error()
+        self._start()
+        self._queue.put((resolve(path), list(row.keys()), dtype, *_to_host(row)))
+
+    @contextlib.contextmanager
+    def batch(self) -> Iterator[None]:
+        """Copy the rows written within the block to the host together, in a single transfer."""
+        assert self._batched is None, "Batches cannot be nested"
+        self._batched = []
+        try:
+            yield
+        finally:
+            batched, self._batched = self._batched, None
+
+        if len(batched) == 0:
+            return
+
+        self._raise_pending_error()
+        self._start()
+        values, ready = _to_host(
+            {
+                (i, key): value
+                for i, (_, row, _) in enumerate(batched)
+                for key, value in row.items()
+            }
+        )
+        values = iter(values)
+        for path, row, dtype in batched:
+            self._queue.put(
+                (path, list(row.keys()), dtype, [next(values) for _ in row], ready)
+            )
+
+    def flush(self) -> None:
+        if self._thread is not None:
+            self._queue.join()
+        self._raise_pending_error()
+
+    def close(self) -> None:
+        atexit.unregister(self.close)
+
+        with self._lock:
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread.join()
+                self._thread = None
+
+            for store in self._stores.values():
+                store.close()
+            self._stores.clear()
+
+        self._raise_pending_error()
+
+    def __reduce__(self):
+        # * Threads and open files cannot be pickled; a copy starts fresh
+        return (type(self), (self.max_pending, self.batch_size))
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="torch_logs.MetricWriter", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size and batch[-1] is not None:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self._write_batch([item for item in batch if item is not None])
+            except BaseException as e:
+                self._error = e
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+            if batch[-1] is None:
+                return
+
+    def _write_batch(self, batch: list) -> None:
+        rows: dict[str, list] = {}
+
+        for path, keys, dtype, values, ready in batch:
+            if ready is not None:
+                ready.synchronize()
+
+            if path not in self._stores:
+                self._stores[path] = MetricStore(path, keys, dtype)
+            rows.setdefault(path, []).append([float(value) for value in values])
+
+        for path, path_rows in rows.items():
+            self._stores[path].append(*path_rows)
+
+    def _raise_pending_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+
+def _to_host(row: Mapping[str, Any]) -> tuple[list[Any], Optional[Any]]:
+    """
+    Start copying the values of a row to the host, returning an event to wait on.
+    Tensor values are stacked so that each row costs a single device-to-host copy.
+    """
+    tensors = [value for value in row.values() if isinstance(value, torch.Tensor)]
+
+    if not any(t.is_cuda for t in tensors):
+        # * Reading CPU tensors never synchronizes, and is cheaper than stacking them
+        return [float(value) for value in row.values()], None
+
+    # * Tensors on other devices are gathered on the first CUDA one
+    device = next(t.device for t in tensors if t.is_cuda)
+    stacked = torch.stack(
+        [
+            torch.as_tensor(t, device=device).detach().reshape(()).to(torch.float64)
+            for t in tensors
+        ]
+    )
+
+    host = torch.empty(stacked.shape, dtype=stacked.dtype, pin_memory=True)
+    host.copy_(stacked, non_blocking=True)
+    ready = torch.cuda.Event()
+    ready.record()
+
+    copied = iter(host)
+    values = [
+        next(copied) if isinstance(value, torch.Tensor) else value
+        for value in row.values()
+    ]
+    return values, ready